@@ -0,0 +1,63 @@
+""" Controller side byte size conversions, the same as the bsize module does """
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+from ansible.errors import AnsibleFilterError
+
+try:
+    from ansible.module_utils.storage_lsr.size import Size
+except ImportError:
+    # the module_utils of a role are only importable by its modules, not by
+    # the controller side plugins; load the role's copy of size.py by its path
+    # under a private name, without touching sys.path
+    import importlib.util
+
+    SIZE_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "module_utils", "storage_lsr", "size.py")
+    _spec = importlib.util.spec_from_file_location("_storage_lsr_size", SIZE_PY)
+    _size_module = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_size_module)
+    Size = _size_module.Size
+
+
+def _size(value):
+    try:
+        return Size(value)
+    except ValueError as e:
+        raise AnsibleFilterError("Invalid size '%s': %s" % (value, e))
+
+
+def size_bytes(value):
+    """ size in bytes as int, e.g. '1 KiB' -> 1024 """
+    return _size(value).bytes
+
+
+def size_lvm(value):
+    """ size in the lvm tools format, e.g. '10 GiB' -> '10g' """
+    return _size(value).to_lvm()
+
+
+def size_parted(value):
+    """ size in the parted format, e.g. '10 GiB' -> '10GiB' """
+    return _size(value).to_parted()
+
+
+def size_human(value):
+    """ size in the largest binary unit, e.g. '10240 MiB' -> '10 GiB' """
+    return _size(value).to_human()
+
+
+class FilterModule(object):
+    """ storage role size filters """
+
+    def filters(self):
+        return {
+            "size_bytes": size_bytes,
+            "size_lvm": size_lvm,
+            "size_parted": size_parted,
+            "size_human": size_human,
+        }
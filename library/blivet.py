@@ -317,6 +317,29 @@ options:
             - bool - set if platform uses_kmod_kvdo
         type: bool
         default: false
+    profile:
+        description:
+            - boolean indicating whether to return wall clock and CPU times of the
+              individual phases of the module run and counts of the scheduled actions
+        type: bool
+        default: false
+    unlock_workers:
+        description:
+            - maximum number of encrypted members of a pool to unlock concurrently;
+              the number is further limited by the available memory, as every
+              unlock can use up to 1 GiB with the default argon2 settings.
+              1 unlocks the members one at a time.
+        type: int
+        default: 1
+    scan_exclusive_disks:
+        description:
+            - boolean indicating whether to scan only the device stacks built on
+              the disks the pools and volumes use (their disks, cache_devices and
+              raid_disks and the physical volumes of existing pools) instead of
+              all block devices on the system. All devices are scanned if the
+              disks cannot be determined.
+        type: bool
+        default: false
 author:
     - David Lehman (@dwlehman)
 '''
@@ -373,14 +396,39 @@ volumes:
     returned: success
     type: list
     elements: dict
+timings:
+    description:
+        - dict with wall clock and CPU times (in seconds) and call counts of the
+          module run phases, pools and volumes are timed individually under the
+          pools and volumes keys
+    returned: when profile is true
+    type: dict
+action_counts:
+    description: dict with the number of scheduled actions of each type
+    returned: when profile is true
+    type: dict
 '''
 
+import contextlib
 import copy
 import logging
 import os
+import threading
+import time
 import traceback
 import inspect
 import re
+import shlex
+import subprocess
+
+
+def _cpu_time():
+    """ Return the user + system CPU time used by this process. """
+    times = os.times()
+    return times[0] + times[1]
+
+
+_IMPORT_START = (time.time(), _cpu_time())
 
 BLIVET_PACKAGE = None
 LIB_IMP_ERR3 = ""
@@ -398,6 +446,7 @@ try:
     from blivet3.formats import fslib, get_format
     from blivet3.partitioning import do_partitioning, parted
     from blivet3.size import Size
+    from blivet3 import udev
     from blivet3.udev import trigger
     from blivet3.util import set_up_logging
     BLIVET_PACKAGE = 'blivet3'
@@ -415,6 +464,7 @@ except ImportError:
         from blivet.formats import fslib, get_format
         from blivet.partitioning import do_partitioning, parted
         from blivet.size import Size
+        from blivet import udev
         from blivet.udev import trigger
         from blivet.util import set_up_logging
         BLIVET_PACKAGE = 'blivet'
@@ -430,6 +480,8 @@ except ImportError:
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.storage_lsr.argument_validator import validate_parameters
 
+_IMPORT_END = (time.time(), _cpu_time())
+
 if BLIVET_PACKAGE:
     blivet_flags.debug = True
     blivet_flags.allow_online_fs_resize = True
@@ -446,25 +498,205 @@ if BLIVET_PACKAGE:
 
 MAX_TRIM_PERCENT = 2
 
+# lsblk file system types the no-op check accepts, anything else (e.g. LUKS,
+# LVM PV or MD member formats) is left to the full blivet code path
+NOOP_FS_TYPES = ('btrfs', 'ext2', 'ext3', 'ext4', 'f2fs', 'gfs2', 'vfat', 'xfs', 'swap')
+
+# argon2 (the default LUKS2 PBKDF) may use up to 1 GiB of memory per unlock
+LUKS_UNLOCK_MEMORY = 1024 ** 3
+
 use_partitions = None  # create partitions on pool backing device disks?
 disklabel_type = None  # user-specified disklabel type
 safe_mode = None       # do not remove any existing devices or formatting
+unlock_workers = 1     # number of encrypted pool members to unlock concurrently
 pool_defaults = dict()
 volume_defaults = dict()
 
 
+class Profiler(object):
+    """ Collect wall clock and CPU times of the phases of the module run. """
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = dict()
+
+    def record(self, path, wall, cpu):
+        entry = self.timings
+        for key in path:
+            entry = entry.setdefault(key, dict())
+
+        entry['wall'] = round(entry.get('wall', 0.0) + wall, 6)
+        entry['cpu'] = round(entry.get('cpu', 0.0) + cpu, 6)
+        entry['calls'] = entry.get('calls', 0) + 1
+
+    @contextlib.contextmanager
+    def measure(self, *path):
+        """ Measure the enclosed block, accumulating the times under the given key path. """
+        if not self.enabled:
+            yield
+            return
+
+        wall, cpu = time.time(), _cpu_time()
+        try:
+            yield
+        finally:
+            self.record(path, time.time() - wall, _cpu_time() - cpu)
+
+    def measure_item(self, pool=None, volume=None):
+        """ Measure the enclosed block for a pool, a volume or a volume of a pool.
+
+            The names come from the user, so the times are kept in the pools and
+            volumes dicts, never next to the wall/cpu/calls keys of a phase.
+        """
+        if volume is None:
+            return self.measure('pools', pool)
+        elif pool is None:
+            return self.measure('volumes', volume)
+        return self.measure('pools', pool, 'volumes', volume)
+
+
+profiler = Profiler()
+
+
+class DeviceIndex(object):
+    """ Hash index of the device tree for resolving device specs.
+
+        DeviceTree.resolve_device() searches the whole device list for every
+        spec. The index maps device names, paths, UUIDs and labels to the
+        devices and resolves specs the same way. It is dropped whenever the
+        tree changes (blivet callbacks, partitioning) and rebuilt on the next
+        lookup. Specs it cannot resolve on its own (BIOS drive numbers,
+        /dev/dm-N and /dev/mdN nodes) are passed on to resolve_device().
+    """
+
+    # tree changes after which the index is rebuilt
+    CALLBACKS = ('populate_started', 'device_added', 'device_removed', 'format_added', 'format_removed',
+                 'parent_added', 'parent_removed', 'attribute_changed', 'action_added', 'action_removed',
+                 'action_executed')
+
+    def __init__(self):
+        self.enabled = False
+        self._tree = None
+        self._names = None
+        self._paths = None
+        self._uuids = None
+        self._labels = None
+        self._resolved = dict()
+
+    def watch(self):
+        """ Start using the index, dropping it whenever blivet reports a change. """
+        if not self.enabled:
+            for name in self.CALLBACKS:
+                getattr(callbacks, name).add(self.invalidate)
+            self.enabled = True
+
+    def invalidate(self, **kwargs):
+        self._tree = None
+        self._resolved = dict()
+
+    def _build(self, tree):
+        lvm_classes = (devices.LVMLogicalVolumeDevice, devices.LVMVolumeGroupDevice)
+        # name/path -> (position in the device list, device); lvm devices also
+        # match the names/paths with escaped dashes
+        self._names = (dict(), dict())
+        self._paths = (dict(), dict())
+        for position, device in enumerate(tree._devices):
+            if not getattr(device, 'complete', True):
+                continue
+            lvm = isinstance(device, lvm_classes)
+            # names prefer the first matching device, paths the last one
+            self._names[0].setdefault(device.name, (position, device))
+            self._paths[0][device.path] = (position, device)
+            if lvm:
+                self._names[1].setdefault(device.name, (position, device))
+                self._paths[1][device.path] = (position, device)
+
+        self._uuids = tree.uuids
+        self._labels = tree.labels
+        self._tree = tree
+
+    def _by_name(self, name):
+        found = [m for m in (self._names[0].get(name), self._names[1].get(name.replace("--", "-"))) if m]
+        return min(found, key=lambda m: m[0])[1] if found else None
+
+    def _by_path(self, path):
+        found = [m for m in (self._paths[0].get(path), self._paths[1].get(path.replace("--", "-"))) if m]
+        return max(found, key=lambda m: m[0])[1] if found else None
+
+    @staticmethod
+    def _unquote(value):
+        if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'"):
+            return value[1:-1]
+        return value
+
+    def _lookup(self, spec):
+        """ Return (resolved, device), resolved is False if resolve_device() has to be used. """
+        if spec.startswith("UUID=") or spec.startswith("PARTUUID="):
+            return True, self._uuids.get(self._unquote(spec.partition("=")[2]))
+        if spec.startswith("LABEL="):
+            return True, self._labels.get(self._unquote(spec.partition("=")[2]))
+        if re.match(r'(0x)?[A-Fa-f0-9]{2}(p\d+)?$', spec):
+            return False, None
+
+        path = spec
+        if not path.startswith("/dev/"):
+            device = self._by_name(spec)
+            if device is not None:
+                return True, device
+            path = "/dev/" + spec
+
+        if path.startswith("/dev/disk/"):
+            path = os.path.realpath(path)
+        if path.startswith("/dev/dm-") or re.match(r'/dev/md\d+(p\d+)?$', path):
+            return False, None
+
+        device = self._by_path(path)
+        if device is None:
+            # /dev/<vg>/<lv>
+            (vg_name, _slash, lv_name) = path[5:].partition("/")
+            if lv_name and "/" not in lv_name:
+                device = self._by_name("%s-%s" % (vg_name, lv_name))
+
+        return True, device
+
+    def resolve(self, tree, spec):
+        if not self.enabled or not spec:
+            return tree.resolve_device(spec)
+
+        if tree is not self._tree:
+            self.invalidate()
+            self._build(tree)
+        if spec not in self._resolved:
+            resolved, device = self._lookup(spec)
+            self._resolved[spec] = device if resolved else tree.resolve_device(spec)
+
+        return self._resolved[spec]
+
+
+device_index = DeviceIndex()
+
+
+def resolve_device(blivet_obj, spec):
+    """ Return the device matching the spec, like DeviceTree.resolve_device(). """
+    return device_index.resolve(blivet_obj.devicetree, spec)
+
+
 def find_duplicate_names(dicts):
     """ Return a list of names that appear more than once in a list of dicts.
 
         Items can be a list of any dicts with a 'name' key; that's all we're
-        looking at. """
-    names = list()
+        looking at. The names are listed in the order their first duplicate
+        appears in. """
+    names = set()
+    reported = set()
     duplicates = list()
     for item in dicts:
-        if item['name'] in names and item['name'] not in duplicates:
-            duplicates.append(item['name'])
-        else:
-            names.append(item['name'])
+        name = item['name']
+        if name not in names:
+            names.add(name)
+        elif name not in reported:
+            reported.add(name)
+            duplicates.append(name)
 
     return duplicates
 
@@ -606,6 +838,7 @@ class BlivetVolume(BlivetBase):
     def __init__(self, blivet_obj, volume, bpool=None):
         super(BlivetVolume, self).__init__(blivet_obj, volume)
         self._blivet_pool = bpool
+        self._looked_up = False
 
     @property
     def _volume(self):
@@ -646,27 +879,24 @@ class BlivetVolume(BlivetBase):
 
     def _look_up_device(self):
         """ Try to look up this volume in blivet's device tree. """
-        if self._device:
+        if self._device or self._looked_up:
             return
 
+        # the pool looks its volumes up before managing them, don't repeat
+        # the search when _manage_device() looks the volume up again
+        self._looked_up = True
         device_id = self._get_device_id()
         if device_id is None:
             return
 
-        device = self._blivet.devicetree.resolve_device(device_id)
+        device = resolve_device(self._blivet, device_id)
         if device is None:
             return
 
         if device.format.type == 'luks':
-            # XXX If we have no key we will always re-encrypt.
-            device.format._key_file = self._volume.get('encryption_key')
-            device.format.passphrase = self._volume.get('encryption_password')
-
-            # set up the original format as well since it'll get used for processing
-            device.original_format._key_file = self._volume.get('encryption_key')
-            device.original_format.passphrase = self._volume.get('encryption_password')
+            self._set_luks_keys(device)
             if device.isleaf:
-                self._blivet.devicetree.populate()
+                unlock_luks_devices(self._blivet, [device])
 
             if not device.isleaf:
                 device = device.children[0]
@@ -678,6 +908,31 @@ class BlivetVolume(BlivetBase):
             self._device = None
             return  # TODO: see if we can create this device w/ the specified name
 
+    def _set_luks_keys(self, device):
+        # XXX If we have no key we will always re-encrypt.
+        device.format._key_file = self._volume.get('encryption_key')
+        device.format.passphrase = self._volume.get('encryption_password')
+
+        # set up the original format as well since it'll get used for processing
+        device.original_format._key_file = self._volume.get('encryption_key')
+        device.original_format.passphrase = self._volume.get('encryption_password')
+
+    def _locked_luks_device(self):
+        """ Return this volume's LUKS device if it still has to be unlocked. """
+        if self._device:
+            return None
+
+        device_id = self._get_device_id()
+        if device_id is None:
+            return None
+
+        device = resolve_device(self._blivet, device_id)
+        if device is None or device.format.type != 'luks' or not device.isleaf:
+            return None
+
+        self._set_luks_keys(device)
+        return device
+
     # pylint doesn't understand that "luks_fmt" is always set when "encrypted" is true
     # pylint: disable=unknown-option-value
     # pylint: disable=possibly-used-before-assignment
@@ -897,8 +1152,13 @@ class BlivetVolume(BlivetBase):
         if fmt is not None:
             self._blivet.format_device(self._device, fmt)
 
-    def manage(self):
-        """ Schedule actions to configure this volume according to the yaml input. """
+    @property
+    def _creates_partition(self):
+        """ Will managing this volume add a new partition that has to be allocated? """
+        return False
+
+    def _manage_device(self):
+        """ Schedule actions to create or remove the volume's device. """
         # look up the device
         self._look_up_device()
 
@@ -916,6 +1176,11 @@ class BlivetVolume(BlivetBase):
         if self._device is None:
             raise BlivetAnsibleError("failed to look up or create device '%s'" % self._volume['name'])
 
+    def _manage_stack(self):
+        """ Schedule actions to configure the encryption, cache, format and size of the device. """
+        if not self.ultimately_present:
+            return
+
         self._manage_encryption()
         self._manage_cache()
 
@@ -935,6 +1200,11 @@ class BlivetVolume(BlivetBase):
         self._volume['_raw_device'] = self._device.raw_device.path
         self._volume['_mount_id'] = self._device.fstab_spec
 
+    def manage(self):
+        """ Schedule actions to configure this volume according to the yaml input. """
+        self._manage_device()
+        self._manage_stack()
+
 
 class BlivetDiskVolume(BlivetVolume):
     blivet_device_class = devices.DiskDevice
@@ -1030,6 +1300,18 @@ class BlivetPartitionVolume(BlivetVolume):
         if self._volume['cached']:
             raise BlivetAnsibleError("caching is not supported for partition volumes")
 
+    @property
+    def _creates_partition(self):
+        return self._device is None and self.ultimately_present
+
+    def manage(self):
+        self._look_up_device()
+        new_partition = self._creates_partition
+        self._manage_device()
+        if new_partition:
+            allocate_partitions(self._blivet, [self])
+        self._manage_stack()
+
     def _get_part_weight(self):
         # XXX make sure the newly created partitions are in right order. We use the partition
         # number as weight, otherwise blivet would create the partitions in random order breaking
@@ -1047,7 +1329,7 @@ class BlivetPartitionVolume(BlivetVolume):
         if self._blivet_pool:
             parent = self._blivet_pool._device
         else:
-            parent = self._blivet.devicetree.resolve_device(self._volume['pool'])
+            parent = resolve_device(self._blivet, self._volume['pool'])
 
         if parent is None:
             raise BlivetAnsibleError("failed to find pool '%s' for volume '%s'" % (self._blivet_pool['name'], self._volume['name']))
@@ -1090,12 +1372,8 @@ class BlivetPartitionVolume(BlivetVolume):
         except Exception:
             raise BlivetAnsibleError("failed set up volume '%s'" % self._volume['name'])
 
+        # the partition gets allocated together with the rest of the pool's new partitions
         self._blivet.create_device(device)
-        try:
-            do_partitioning(self._blivet)
-        except Exception:
-            raise BlivetAnsibleError("partition allocation failed for volume '%s'" % self._volume['name'])
-
         self._device = device
 
 
@@ -1186,7 +1464,7 @@ class BlivetLVMVolume(BlivetVolume):
             pvs = list()
 
             for path in self._volume['raid_disks']:
-                disk = self._blivet.devicetree.resolve_device(path)
+                disk = resolve_device(self._blivet, path)
                 if disk:
                     for pv in parent_device.pvs:
                         if pv == disk or disk in pv.ancestors:
@@ -1216,19 +1494,66 @@ class BlivetLVMVolume(BlivetVolume):
         except Exception as e:
             raise BlivetAnsibleError("failed to detach cache from volume '%s': %s" % (self._device.name, str(e)))
 
-        # full reset is needed for the cache pool to be added to the devicetree so we can remove it
-        self._blivet.reset()
-
         cpool_name = cpool_name.rstrip("_cpool")
-        cpool_device = self._blivet.devicetree.resolve_device("%s-%s" % (self._device.vg.name, cpool_name))
+        try:
+            cpool_device = self._refresh_detached_cache(cpool_name)
+        except Exception as e:
+            log.warning("failed to add the detached cache pool '%s' to the devicetree: %s", cpool_name, str(e))
+            cpool_device = None
+
+        if cpool_device is None:
+            # full reset is needed for the cache pool to be added to the devicetree so we can remove it
+            self._blivet.reset()
+            cpool_device = resolve_device(self._blivet, "%s-%s" % (self._device.vg.name, cpool_name))
 
         self._blivet.destroy_device(cpool_device)
 
+    def _refresh_detached_cache(self, cpool_name):
+        """ Update the devicetree after detaching a cache without a full reset
+
+            Only the LVs of the volume's VG are rescanned. The cache pool internal
+            LV is turned into a standalone cache pool LV in the existing tree, so
+            the actions scheduled so far are kept. Returns the cache pool device
+            or None if the LVs of the VG don't match the expected state.
+        """
+        lv = self._device.raw_device
+        vg = lv.vg
+        lvs = dict((info.lv_name, info) for info in devicelibs.lvm.blockdev.lvm.lvs(vg.name))
+        devicelibs.lvm.lvs_info.drop_cache()
+        lv_info = lvs.get(lv.lvname)
+        cpool_info = lvs.get(cpool_name)
+        if lv_info is None or cpool_info is None:
+            return None
+
+        int_lvs = dict()
+        for int_lv in list(lv._internal_lvs):
+            if int_lv.int_lv_type in (devices.lvm.LVMInternalLVtype.cache_pool, devices.lvm.LVMInternalLVtype.origin):
+                int_lvs[int_lv.int_lv_type] = int_lv
+                lv.remove_internal_lv(int_lv)
+
+        cpool_device = devices.LVMLogicalVolumeDevice(cpool_info.lv_name, parents=[vg], uuid=cpool_info.uuid,
+                                                      size=Size(cpool_info.size), seg_type=cpool_info.segtype,
+                                                      exists=True)
+
+        # internal LVs of the cache origin (e.g. RAID images) now belong to the LV itself and
+        # the cache pool data and metadata LVs to the standalone cache pool
+        for int_type, parent in ((devices.lvm.LVMInternalLVtype.origin, lv),
+                                 (devices.lvm.LVMInternalLVtype.cache_pool, cpool_device)):
+            if int_type in int_lvs:
+                for int_lv in list(int_lvs[int_type]._internal_lvs):
+                    int_lv.parent_lv = parent
+
+        lv._cache = None
+        lv.seg_type = lv_info.segtype
+        self._blivet.devicetree._add_device(cpool_device)
+
+        return cpool_device
+
     def _get_cache_pvs(self):
         parent = self._blivet_pool._device
         fast_pvs = []
         for cache_spec in self._volume['cache_devices']:
-            cache_device = self._blivet.devicetree.resolve_device(cache_spec)
+            cache_device = resolve_device(self._blivet, cache_spec)
             if cache_device is None:
                 raise BlivetAnsibleError("cache device '%s' not found" % cache_spec)
 
@@ -1349,7 +1674,7 @@ class BlivetMDRaidVolume(BlivetVolume):
         members = list()
 
         for member_name in member_names:
-            member_disk = self._blivet.devicetree.resolve_device(member_name)
+            member_disk = resolve_device(self._blivet, member_name)
             if member_disk is not None:
                 if use_partitions:
                     # create partition table
@@ -1389,7 +1714,7 @@ class BlivetMDRaidVolume(BlivetVolume):
             return
 
         for spec in self._volume["disks"]:
-            disk = self._blivet.devicetree.resolve_device(spec)
+            disk = resolve_device(self._blivet, spec)
             if not disk.isleaf or disk.format.type is not None:
                 if safe_mode and (disk.format.type is not None or disk.format.name != get_format(None).name):
                     raise BlivetAnsibleError("cannot remove existing formatting and/or devices on disk '%s' in safe mode" % disk.name)
@@ -1401,7 +1726,9 @@ class BlivetMDRaidVolume(BlivetVolume):
 
         if use_partitions:
             try:
-                do_partitioning(self._blivet)
+                with profiler.measure('do_partitioning'):
+                    do_partitioning(self._blivet)
+                device_index.invalidate()
             except Exception as e:
                 raise BlivetAnsibleError("failed to allocate partitions for mdraid '%s': %s" % (self._volume['name'], str(e)))
 
@@ -1511,6 +1838,135 @@ class BlivetStratisVolume(BlivetVolume):
         self._device = device
 
 
+def allocate_partitions(blivet_obj, bvolumes):
+    """ Allocate the new partitions of the given volumes in a single pass. """
+    try:
+        with profiler.measure('do_partitioning'):
+            do_partitioning(blivet_obj)
+        device_index.invalidate()
+    except Exception:
+        raise BlivetAnsibleError("partition allocation failed for volume '%s'" %
+                                 "', '".join(bvolume._volume['name'] for bvolume in bvolumes))
+
+
+def _mem_available():
+    """ Return the memory available for new processes in bytes or None if unknown. """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+
+    return None
+
+
+def luks_unlock_workers(workers, count):
+    """ Return how many of count LUKS devices to unlock at a time with the available memory. """
+    available = _mem_available()
+    if available is not None:
+        workers = min(workers, available // LUKS_UNLOCK_MEMORY)
+
+    return max(1, min(workers, count))
+
+
+def _luks_open(path, map_name, passphrase=None, key_file=None):
+    """ Open the LUKS device with cryptsetup, without holding blivet's global lock. """
+    args = ['cryptsetup', 'open', '--type', 'luks', path, map_name, '--key-file', '-' if passphrase else key_file]
+    proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    dummy, err = proc.communicate(passphrase.encode('utf-8') if passphrase else None)
+    if proc.returncode != 0:
+        raise BlivetAnsibleError("failed to open %s: %s" % (path, err.decode('utf-8', 'replace').strip()))
+
+
+def _open_luks_devices(luks_devices, workers, passphrase=None, key_file=None):
+    """ Open the LUKS devices using up to workers threads, return the ones that failed to open. """
+    # blivet's format properties take its global lock, look them up front
+    pending = [(device, device.format.device, device.format.map_name) for device in reversed(luks_devices)]
+    failed = list()
+    queue_lock = threading.Lock()
+
+    def run_opens():
+        while True:
+            with queue_lock:
+                if not pending:
+                    return
+                device, path, map_name = pending.pop()
+
+            try:
+                _luks_open(path, map_name, passphrase, key_file)
+            except Exception as e:  # pylint: disable=broad-except
+                log.info("setup of %s failed: %s", map_name, str(e))
+                with queue_lock:
+                    failed.append(device)
+
+    threads = [threading.Thread(target=run_opens) for dummy in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return failed
+
+
+def unlock_luks_devices(blivet_obj, luks_devices, workers=1, passphrase=None, key_file=None):
+    """ Open the given LUKS devices and add the opened devices to the device tree.
+
+        Only the mapped devices and what they contain are discovered instead of
+        repopulating the whole device tree. The tree is repopulated only if one
+        of the mapped devices cannot be added this way.
+
+        With more than one worker and the passphrase or key file given, the
+        devices are opened concurrently, as many at a time as the available
+        memory allows for (see luks_unlock_workers()).
+    """
+    luks_devices = [device for device in luks_devices if device.format.configured]
+    locked = [device for device in luks_devices if not device.format.status]
+    workers = luks_unlock_workers(workers, len(locked))
+    if workers > 1 and (passphrase or key_file):
+        with profiler.measure('luks_open'):
+            failed = _open_luks_devices(locked, workers, passphrase, key_file)
+    else:
+        failed = list()
+        for device in locked:
+            try:
+                device.format.setup()
+            except Exception as e:
+                log.info("setup of %s failed: %s", device.format.map_name, str(e))
+                failed.append(device)
+
+    opened = [device for device in luks_devices if not any(device is f for f in failed)]
+    if not opened:
+        return
+
+    udev.settle()
+    populate = False
+    for device in opened:
+        info = udev.get_device(device_node="/dev/mapper/%s" % device.format.map_name)
+        try:
+            if info is not None:
+                blivet_obj.devicetree.handle_device(info)
+        except Exception as e:
+            log.info("failed to add %s to the device tree: %s", device.format.map_name, str(e))
+
+        if device.isleaf:
+            populate = True
+
+    if populate:
+        blivet_obj.devicetree.populate()
+    device_index.invalidate()
+
+
+def unlock_volumes(blivet_obj, bvolumes):
+    """ Unlock the existing LUKS devices of the given volumes in a single pass. """
+    luks_devices = [bvolume._locked_luks_device() for bvolume in bvolumes]
+    luks_devices = [device for device in luks_devices if device is not None]
+    if luks_devices:
+        with profiler.measure('unlock'):
+            unlock_luks_devices(blivet_obj, luks_devices)
+
+
 _BLIVET_VOLUME_TYPES = {
     "disk": BlivetDiskVolume,
     "lvm": BlivetLVMVolume,
@@ -1609,7 +2065,7 @@ class BlivetPool(BlivetBase):
 
         disks = list()
         for spec in self._pool['disks']:
-            device = self._blivet.devicetree.resolve_device(spec)
+            device = resolve_device(self._blivet, spec)
             if device is not None:  # XXX fail if any disk isn't resolved?
                 disks.append(device)
 
@@ -1618,9 +2074,43 @@ class BlivetPool(BlivetBase):
 
         self._disks = disks
 
+    def _unlock_members(self):
+        """ Unlock the pool's encrypted disks or partitions, return True if any was unlocked. """
+        passphrase = self._pool.get("encryption_password")
+        key_file = self._pool.get("encryption_key")
+        if not passphrase and not key_file:
+            return False
+
+        locked = list()
+        for spec in self._pool.get('disks') or []:
+            disk = resolve_device(self._blivet, spec)
+            if disk is None:
+                continue
+
+            for member in [disk] + list(disk.children):
+                if member.format.type == "luks" and member.isleaf and not any(member is m for m in locked):
+                    locked.append(member)
+
+        for member in locked:
+            for fmt in (member.format, member.original_format):
+                if passphrase:
+                    fmt.passphrase = passphrase
+                if key_file:
+                    fmt.key_file = key_file
+
+        if locked:
+            with profiler.measure('unlock'):
+                unlock_luks_devices(self._blivet, locked, workers=unlock_workers,
+                                    passphrase=passphrase, key_file=key_file)
+
+        return bool(locked)
+
     def _look_up_device(self):
         """ Look up the pool in blivet's device tree. """
-        device = self._blivet.devicetree.resolve_device(self._pool['name'])
+        device = resolve_device(self._blivet, self._pool['name'])
+        if device is None and self._unlock_members():
+            # the pool can only be found once its encrypted members are unlocked
+            device = resolve_device(self._blivet, self._pool['name'])
         if device is None:
             return
 
@@ -1716,14 +2206,20 @@ class BlivetPool(BlivetBase):
         else:
             self._blivet.format_device(member, self._get_format())
 
-        if use_partitions:
-            try:
-                do_partitioning(self._blivet)
-            except Exception:
-                raise BlivetAnsibleError("failed to allocate partitions for pool '%s'" % self._pool['name'])
-
         return member
 
+    def _allocate_members(self):
+        """ Allocate the partitions of all new members in a single pass. """
+        if not use_partitions:
+            return
+
+        try:
+            with profiler.measure('do_partitioning'):
+                do_partitioning(self._blivet)
+            device_index.invalidate()
+        except Exception:
+            raise BlivetAnsibleError("failed to allocate partitions for pool '%s'" % self._pool['name'])
+
     def _create_members(self):
         """ Schedule actions as needed to ensure pool member devices exist. """
         members = list()
@@ -1732,6 +2228,8 @@ class BlivetPool(BlivetBase):
             member = self._create_one_member(disk)
             members.append(member)
 
+        self._allocate_members()
+
         if self._is_raid:
             raid_name = "%s-1" % self._pool['name']
 
@@ -1751,10 +2249,42 @@ class BlivetPool(BlivetBase):
             self._blivet_volumes.append(bvolume)
 
     def _manage_volumes(self):
-        """ Schedule actions as needed to configure this pool's volumes. """
+        """ Schedule actions as needed to configure this pool's volumes.
+
+            New partition volumes that follow each other are allocated in a single
+            pass instead of re-running the allocation for every one of them.
+        """
         self._get_volumes()
+        unlock_volumes(self._blivet, self._blivet_volumes)
+        pending = list()
+
+        def allocate_pending():
+            if not pending:
+                return
+
+            allocate_partitions(self._blivet, pending)
+            for bvolume in pending:
+                with profiler.measure_item(pool=self._pool['name'], volume=bvolume._volume['name']):
+                    bvolume._manage_stack()
+            del pending[:]
+
         for bvolume in self._blivet_volumes:
-            bvolume.manage()
+            with profiler.measure_item(pool=self._pool['name'], volume=bvolume._volume['name']):
+                bvolume._look_up_device()
+
+            new_partition = bvolume._creates_partition
+            if not new_partition:
+                # anything else may depend on the current partition layout
+                allocate_pending()
+
+            with profiler.measure_item(pool=self._pool['name'], volume=bvolume._volume['name']):
+                bvolume._manage_device()
+                if new_partition:
+                    pending.append(bvolume)
+                else:
+                    bvolume._manage_stack()
+
+        allocate_pending()
 
     def _manage_members(self):
         """ Schedule actions as needed to configure this pool's members. """
@@ -1791,7 +2321,7 @@ class BlivetPartitionPool(BlivetPool):
         return self._device.partitionable
 
     def _look_up_device(self):
-        device = self._blivet.devicetree.resolve_device(self._pool['name'])
+        device = resolve_device(self._blivet, self._pool['name'])
         if device is not None:
             self._device = device
         else:
@@ -1974,8 +2504,10 @@ class BlivetLVMPool(BlivetPool):
         if self._is_raid:
             raise BlivetAnsibleError("managing pool members is not supported with RAID")
 
-        for disk in add_disks:
-            member = self._create_one_member(disk)
+        new_members = [self._create_one_member(disk) for disk in add_disks]
+        self._allocate_members()
+
+        for disk, member in zip(add_disks, new_members):
             member = self._manage_one_encryption(member)
 
             try:
@@ -2094,8 +2626,10 @@ class BlivetStratisPool(BlivetPool):
         if not add_disks:
             return
 
-        for disk in add_disks:
-            member = self._create_one_member(disk)
+        new_members = [self._create_one_member(disk) for disk in add_disks]
+        self._allocate_members()
+
+        for disk, member in zip(add_disks, new_members):
             try:
                 ac = ActionAddMember(self._device, member)
                 self._blivet.devicetree.actions.add(ac)
@@ -2176,17 +2710,50 @@ def manage_pool(b, pool):
         volume['_mount_id'] = bvolume._volume.get('_mount_id', '')
 
 
+# UUID=, LABEL=, PARTUUID=, PARTLABEL=, ID= style fstab device specs
+FSTAB_TAG = re.compile(r'^[A-Z]+=')
+
+
 class FSTab(object):
+    # entries are indexed by these keys, other keys fall back to a linear search
+    INDEX_KEYS = ('device_id', 'device_path', 'mount_point')
+
     def __init__(self, blivet_obj):
         self._blivet = blivet_obj
         self._entries = list()
+        self._index = dict((key, dict()) for key in self.INDEX_KEYS)
         self.parse()
 
     def lookup(self, key, value):
+        if key in self._index:
+            return self._index[key].get(value)
+
         return next((e for e in self._entries if e.get(key) == value), None)
 
     def reset(self):
         self._entries = list()
+        self._index = dict((key, dict()) for key in self.INDEX_KEYS)
+
+    def _resolve_path(self, spec):
+        device = resolve_device(self._blivet, spec)
+        return getattr(device, 'path', None)
+
+    @staticmethod
+    def _may_be_device(spec):
+        # network shares (host:/export, //server/share) and bind mounts of
+        # directories can never resolve to a block device, don't make blivet
+        # search its device list for them; device paths and KEY=value tags may
+        # contain colons (e.g. /dev/md/host:name, LABEL=a:b)
+        if spec.startswith('/dev/') or FSTAB_TAG.match(spec):
+            return True
+
+        return ':' not in spec and not spec.startswith('/')
+
+    def _add_entry(self, entry):
+        self._entries.append(entry)
+        for key in self.INDEX_KEYS:
+            # keep the first matching entry, like a search from the top would
+            self._index[key].setdefault(entry[key], entry)
 
     def parse(self):
         if self._entries:
@@ -2195,6 +2762,11 @@ class FSTab(object):
         if not os.path.exists('/etc/fstab'):
             return
 
+        # Resolve the device specs now, while the device tree still reflects
+        # the current state of the system. Scheduled actions change the tree
+        # immediately (eg: removed devices disappear from it), so this cannot
+        # be deferred until the entries are looked up.
+        paths = dict()
         with open('/etc/fstab') as f:
             for line in f.readlines():
                 if line.lstrip().startswith("#"):
@@ -2204,12 +2776,14 @@ class FSTab(object):
                 if len(fields) < 6:
                     continue
 
-                device = self._blivet.devicetree.resolve_device(fields[0])
-                self._entries.append(dict(device_id=fields[0],
-                                          device_path=getattr(device, 'path', None),
-                                          fs_type=fields[2],
-                                          mount_point=fields[1],
-                                          mount_options=fields[3]))
+                if fields[0] not in paths:
+                    paths[fields[0]] = self._resolve_path(fields[0]) if self._may_be_device(fields[0]) else None
+
+                self._add_entry(dict(device_id=fields[0],
+                                     device_path=paths[fields[0]],
+                                     fs_type=fields[2],
+                                     mount_point=fields[1],
+                                     mount_options=fields[3]))
 
 
 def get_mount_info(pools, volumes, actions, fstab):
@@ -2328,9 +2902,9 @@ def update_fstab_identifiers(b, pools, volumes):
 
     for volume in all_volumes:
         if volume['state'] == 'present':
-            device = b.devicetree.resolve_device(volume['_mount_id'])
+            device = resolve_device(b, volume['_mount_id'])
             if device is None and volume['encryption']:
-                device = b.devicetree.resolve_device(volume['_raw_device'])
+                device = resolve_device(b, volume['_raw_device'])
                 if device is not None and not device.isleaf:
                     device = device.children[0]
                     volume['_device'] = device.path
@@ -2358,11 +2932,363 @@ def activate_swaps(b, pools, volumes):
 
     for volume in all_volumes:
         if volume['state'] == 'present':
-            device = b.devicetree.resolve_device(volume['_mount_id'])
+            device = resolve_device(b, volume['_mount_id'])
             if device.format.type == 'swap':
                 device.format.setup()
 
 
+class DeviceReport(object):
+    """ Lightweight snapshot of the block device stacks built from lsblk and LVM reports.
+
+        This is used to detect runs that would not change anything without paying
+        for a full blivet device scan.
+    """
+    # fstab style device tags resolved from the lsblk columns of the same name
+    TAGS = ('UUID', 'LABEL', 'PARTUUID', 'PARTLABEL')
+
+    def __init__(self):
+        self.devices = dict()       # kernel device path -> lsblk row
+        self.paths = dict()         # device path -> kernel device path
+        self.parents = dict()       # kernel device path -> list of parent kernel device paths
+        self.children = dict()      # kernel device path -> list of child kernel device paths
+        self.pvs = dict()           # vg name -> list of pv kernel device paths
+        self.lvs = dict()           # (vg name, lv name) -> lvs row
+
+    def add_device(self, row):
+        kname = row['kname']
+        if kname not in self.devices:
+            self.devices[kname] = row
+            self.paths[row['name']] = kname
+            self.paths[kname] = kname
+            self.parents[kname] = list()
+            self.children.setdefault(kname, list())
+
+        pkname = row.get('pkname')
+        if pkname and pkname not in self.parents[kname]:
+            self.parents[kname].append(pkname)
+            self.children.setdefault(pkname, list()).append(kname)
+
+    def lookup(self, spec):
+        """ Return the lsblk row for a device spec or None if it cannot be resolved. """
+        key, _eq, value = spec.partition("=")
+        if key in self.TAGS:
+            value = value.strip('"\'')
+            return next((d for d in self.devices.values() if value and d[key.lower()] == value), None)
+
+        if not spec.startswith("/"):
+            spec = "/dev/" + spec
+        kname = self.paths.get(spec)
+        if kname is None and os.path.exists(spec):
+            kname = self.paths.get(os.path.realpath(spec))
+
+        return self.devices.get(kname)
+
+    def disks(self, kname):
+        """ Return the sorted names of the disks a device is built on. """
+        if self.devices[kname]['type'] == 'disk':
+            return [os.path.basename(kname)]
+
+        disks = set()
+        for parent in self.parents[kname]:
+            disks.update(self.disks(parent))
+        return sorted(disks)
+
+    def stack_types(self, kname):
+        """ Return the set of lsblk device types in the stack under a device. """
+        types = set([self.devices[kname]['type']])
+        for parent in self.parents[kname]:
+            types.update(self.stack_types(parent))
+        return types
+
+
+def _parse_report_pairs(buf):
+    """ Parse lsblk --pairs/lvm --nameprefixes style output into a list of dicts. """
+    rows = list()
+    for line in buf.splitlines():
+        row = dict()
+        for pair in shlex.split(line):
+            key, _eq, value = pair.partition("=")
+            if key:
+                row[key.lower().replace('lvm2_', '')] = value
+        if row:
+            rows.append(row)
+    return rows
+
+
+def get_device_report(module):
+    """ Collect a DeviceReport for the system or return None if that is not possible. """
+    lsblk = module.get_bin_path('lsblk')
+    lvm = module.get_bin_path('lvm')
+    if lsblk is None or lvm is None:
+        return None
+
+    report = DeviceReport()
+
+    rc, out, _err = module.run_command([lsblk, "-b", "-p", "-P",
+                                        "-o", "NAME,KNAME,PKNAME,TYPE,SIZE,FSTYPE,LABEL,UUID,"
+                                              "PARTLABEL,PARTUUID,MOUNTPOINT"])
+    if rc != 0:
+        return None
+    for row in _parse_report_pairs(out):
+        report.add_device(row)
+
+    rc, out, _err = module.run_command([lvm, "pvs", "--noheadings", "--nameprefixes", "-o", "pv_name,vg_name"])
+    if rc != 0:
+        return None
+    for row in _parse_report_pairs(out):
+        if row['vg_name']:
+            pv = report.lookup(row['pv_name'])
+            report.pvs.setdefault(row['vg_name'], list()).append(pv['kname'] if pv else None)
+
+    rc, out, _err = module.run_command([lvm, "lvs", "--noheadings", "--nameprefixes", "-o", "vg_name,lv_name,lv_attr,segtype"])
+    if rc != 0:
+        return None
+    for row in _parse_report_pairs(out):
+        report.lvs[(row['vg_name'], row['lv_name'])] = row
+
+    return report
+
+
+def get_scan_filter(report, pools, volumes):
+    """ Return the disks and the unrelated devices for a scan of only the relevant device stacks.
+
+        The relevant stacks are built on the devices listed in the pools' and
+        volumes' disks, cache_devices and raid_disks and on the PVs of existing
+        VGs named like the pools. They are extended with every device sharing a
+        stack with them, e.g. the other PVs of a VG spanning one of the listed
+        disks. Returns a tuple of the names of the disks the relevant stacks are
+        built on and the kernel names of all the other devices, or None if the
+        relevant stacks cannot be determined from the report.
+    """
+    specs = list()
+    knames = list()
+    for pool in pools:
+        if pool['name'] in report.pvs:
+            knames.extend(report.pvs[pool['name']])
+        elif not pool.get('disks'):
+            return None
+        specs.extend(pool.get('disks') or [])
+
+    if not all(volume.get('disks') for volume in volumes):
+        return None
+
+    for volume in volumes + [v for pool in pools for v in pool.get('volumes') or []]:
+        for key in ('disks', 'cache_devices', 'raid_disks'):
+            specs.extend(volume.get(key) or [])
+
+    for spec in specs:
+        row = report.lookup(spec)
+        knames.append(row['kname'] if row else None)
+
+    if None in knames:
+        return None
+
+    stacks = set()
+    while knames:
+        kname = knames.pop()
+        if kname not in stacks:
+            stacks.add(kname)
+            knames.extend(report.parents.get(kname, []))
+            knames.extend(report.children.get(kname, []))
+
+    disks = sorted(os.path.basename(kname) for kname in stacks if not report.parents.get(kname))
+    ignored = sorted(os.path.basename(kname) for kname in report.devices if kname not in stacks)
+    return disks, ignored
+
+
+def set_up_exclusive_scan(b, report, pools, volumes):
+    """ Limit the blivet device scan to the device stacks relevant to the pools and volumes.
+
+        The disks are passed to blivet's exclusive disks filter and the devices
+        of all the other stacks are not probed at all. Devices that are not in
+        the report (e.g. created later in the run) are not filtered.
+    """
+    scan_filter = get_scan_filter(report, pools, volumes) if report is not None else None
+    if scan_filter is None:
+        log.info("unable to determine the relevant disks, scanning all devices")
+        return
+
+    b.exclusive_disks, ignored = scan_filter
+    if ignored:
+        udev.ignored_device_names.append("^(%s)$" % "|".join(re.escape(name) for name in ignored))
+
+
+def _spec_size(spec):
+    """ Return the size in bytes requested by a volume size spec. """
+    return int(Size(spec))
+
+
+def _apply_report_defaults(spec, defaults, device_values):
+    """ Fill in a spec dict the same way _apply_defaults does for an existing device. """
+    for name, default in defaults.items():
+        if name in spec and spec[name] not in [None, list(), dict()]:
+            continue
+
+        default = None if default in ('none', 'None', 'null') else default
+        spec[name] = device_values.get(name, default)
+
+
+def _noop_volume(report, volume, device, disks):
+    """ Check that an existing volume matches its spec, filling in the result fields.
+
+        Raises BlivetAnsibleError describing the first mismatch found.
+    """
+    kname = device['kname']
+    if report.stack_types(kname) - set(['disk', 'part', 'lvm']):
+        raise BlivetAnsibleError("volume '%s' is not a plain device stack" % volume['name'])
+
+    for name in ('encryption', 'raid_level', 'cached', 'thin', 'compression', 'deduplication', 'vdo_pool_size'):
+        if volume.get(name) or volume_defaults.get(name) not in (None, False, 'none', 'None', 'null'):
+            raise BlivetAnsibleError("volume '%s' uses '%s'" % (volume['name'], name))
+
+    if device['fstype'] not in NOOP_FS_TYPES or (volume['fs_type'] and volume['fs_type'] != device['fstype']):
+        raise BlivetAnsibleError("volume '%s' format does not match" % volume['name'])
+
+    device_values = dict(size=int(device['size']),
+                         fs_type=device['fstype'],
+                         fs_label=device['label'],
+                         disks=disks,
+                         encryption=False)
+
+    if device['fstype'] == 'swap':
+        if volume['mount_point'] and volume['mount_point'].startswith('/'):
+            raise BlivetAnsibleError("volume '%s' has a mount point but no mountable file system" % volume['name'])
+        if device['mountpoint'] != '[SWAP]':
+            raise BlivetAnsibleError("volume '%s' swap is not active" % volume['name'])
+        device_values['mount_point'] = None
+    elif volume['mount_point'] is None:
+        # blivet would pick up the current mount point, do not try to guess it
+        raise BlivetAnsibleError("volume '%s' has no mount point specified" % volume['name'])
+
+    if volume['fs_label'] is not None and volume['fs_label'] != device['label']:
+        raise BlivetAnsibleError("volume '%s' label does not match" % volume['name'])
+
+    if volume['size'] and str(volume['size']) != '0':
+        if '%' in str(volume['size']):
+            raise BlivetAnsibleError("volume '%s' has a relative size" % volume['name'])
+        try:
+            size = _spec_size(volume['size'])
+        except Exception:
+            raise BlivetAnsibleError("volume '%s' has an invalid size" % volume['name'])
+        if size != int(device['size']):
+            raise BlivetAnsibleError("volume '%s' size does not match" % volume['name'])
+
+    _apply_report_defaults(volume, volume_defaults, device_values)
+
+    volume['_device'] = device['name']
+    volume['_raw_device'] = device['name']
+    volume['_mount_id'] = "UUID=%s" % device['uuid'] if device['uuid'] else device['name']
+    volume['_kernel_device'] = kname
+    volume['_raw_kernel_device'] = kname
+
+
+def _noop_pool(report, pool):
+    """ Check that an existing LVM pool and its volumes match the spec. """
+    if pool['state'] != 'present' or (pool['type'] or pool_defaults.get('type')) != 'lvm':
+        raise BlivetAnsibleError("pool '%s' is not an existing LVM pool" % pool['name'])
+
+    for name in ('encryption', 'raid_level', 'grow_to_fill'):
+        if pool.get(name) or pool_defaults.get(name) not in (None, False, 'none', 'None', 'null'):
+            raise BlivetAnsibleError("pool '%s' uses '%s'" % (pool['name'], name))
+
+    if not pool['name'] or '-' in pool['name'] or not pool['disks'] or pool['name'] not in report.pvs:
+        raise BlivetAnsibleError("pool '%s' cannot be checked" % pool['name'])
+
+    disks = list()
+    for spec in pool['disks']:
+        disk = report.lookup(spec)
+        if disk is None or disk['type'] != 'disk':
+            raise BlivetAnsibleError("pool '%s' disk '%s' cannot be resolved" % (pool['name'], spec))
+        disks.append(disk['kname'])
+
+    pv_disks = list()
+    for pv in report.pvs[pool['name']]:
+        if pv is None or report.devices[pv]['type'] not in ('disk', 'part'):
+            raise BlivetAnsibleError("pool '%s' has unsupported members" % pool['name'])
+        pv_disks.extend(report.parents[pv] if report.devices[pv]['type'] == 'part' else [pv])
+
+    if sorted(set(disks)) != sorted(pv_disks):
+        raise BlivetAnsibleError("pool '%s' members do not match" % pool['name'])
+
+    pool['type'] = 'lvm'
+    _apply_report_defaults(pool, pool_defaults, dict(encryption=False))
+
+    for volume in pool['volumes']:
+        if volume['state'] != 'present' or (volume['type'] or 'lvm') != 'lvm':
+            raise BlivetAnsibleError("volume '%s' is not an existing LVM volume" % volume['name'])
+
+        lv = report.lvs.get((pool['name'], volume['name']))
+        if not volume['name'] or '-' in volume['name'] or lv is None:
+            raise BlivetAnsibleError("volume '%s' does not exist" % volume['name'])
+
+        if lv['lv_attr'][0] != '-' or lv['segtype'] != 'linear':
+            raise BlivetAnsibleError("volume '%s' is not a linear LV" % volume['name'])
+
+        device = report.lookup("/dev/mapper/%s-%s" % (pool['name'], volume['name']))
+        if device is None:
+            raise BlivetAnsibleError("volume '%s' is not active" % volume['name'])
+
+        volume['type'] = 'lvm'
+        _noop_volume(report, volume, device, report.disks(device['kname']))
+
+
+def _noop_disk_volume(report, volume):
+    """ Check that an existing whole disk volume matches the spec. """
+    if volume['state'] != 'present' or (volume['type'] or volume_defaults.get('type')) != 'disk':
+        raise BlivetAnsibleError("volume '%s' is not an existing disk volume" % volume['name'])
+
+    device = report.lookup(volume['disks'][0]) if volume['disks'] else None
+    if device is None or device['type'] != 'disk' or report.children[device['kname']]:
+        raise BlivetAnsibleError("volume '%s' disk cannot be checked" % volume['name'])
+
+    volume['type'] = 'disk'
+    _noop_volume(report, volume, device, [os.path.basename(device['kname'])])
+
+
+class ReportFSTab(FSTab):
+    """ FSTab resolving device specs with a DeviceReport instead of a blivet device tree. """
+    def __init__(self, report):
+        self._report = report
+        super(ReportFSTab, self).__init__(None)
+
+    def _resolve_path(self, spec):
+        device = self._report.lookup(spec)
+        return device['name'] if device else None
+
+
+def check_noop(module, report):
+    """ Return a result dict if the system already matches the spec, otherwise None.
+
+        The check is deliberately conservative: only plain LVM pools and whole disk
+        volumes are considered, anything else (and any mismatch) means the full
+        blivet code path has to run.
+    """
+    pools = copy.deepcopy(module.params['pools'])
+    volumes = copy.deepcopy(module.params['volumes'])
+
+    if find_duplicate_names(pools) or find_duplicate_names(volumes) or \
+       any(find_duplicate_names(pool['volumes']) for pool in pools):
+        return None
+
+    try:
+        for pool in pools:
+            _noop_pool(report, pool)
+        for volume in volumes:
+            _noop_disk_volume(report, volume)
+    except BlivetAnsibleError as e:
+        log.debug("no-op check failed: %s", e)
+        return None
+
+    return dict(changed=False,
+                actions=list(),
+                leaves=sorted(d['name'] for (k, d) in report.devices.items() if not report.children[k]),
+                mounts=get_mount_info(pools, volumes, list(), ReportFSTab(report)),
+                crypts=list(),
+                pools=pools,
+                volumes=volumes,
+                packages=list())
+
+
 def format_option(name, option, input, indent):
     output = input
     space = " " * indent
@@ -2493,6 +3419,9 @@ def run_module():
         use_partitions=dict(type='bool', required=False),
         diskvolume_mkfs_option_map=dict(type='dict', required=False, default={}),
         uses_kmod_kvdo=dict(type='bool', required=False, default=False),
+        profile=dict(type='bool', required=False, default=False),
+        unlock_workers=dict(type='int', required=False, default=1),
+        scan_exclusive_disks=dict(type='bool', required=False, default=False),
     )
 
     # comment this out if not generating module docs
@@ -2514,7 +3443,16 @@ def run_module():
     module = AnsibleModule(argument_spec=module_args,
                            supports_check_mode=True)
 
-    errors, updated_params = validate_parameters(module_args, module.params)
+    if module.params['profile']:
+        # the timings dict is shared with the profiler so that it is complete
+        # at whatever point the module exits
+        profiler.enabled = True
+        profiler.record(['import'], _IMPORT_END[0] - _IMPORT_START[0], _IMPORT_END[1] - _IMPORT_START[1])
+        result['timings'] = profiler.timings
+        result['action_counts'] = dict()
+
+    with profiler.measure('validation'):
+        errors, updated_params = validate_parameters(module_args, module.params)
     if errors:
         module.fail_json(msg="Parameter check failed: %s" % errors)
 
@@ -2554,18 +3492,42 @@ def run_module():
     global uses_kmod_kvdo
     uses_kmod_kvdo = module.params['uses_kmod_kvdo']
 
+    global unlock_workers
+    unlock_workers = module.params['unlock_workers']
+
     b = Blivet()
-    b.reset()
-    fstab = FSTab(b)
-    actions = list()
 
     if module.params['packages_only']:
+        # The package list is derived from the input specification alone, so
+        # there is no need to pay for a full device scan here. The scan is
+        # done once, by the invocation that actually applies the changes.
         try:
-            result['packages'] = get_required_packages(b, module.params['pools'], module.params['volumes'])
+            with profiler.measure('packages'):
+                result['packages'] = get_required_packages(b, module.params['pools'], module.params['volumes'])
         except BlivetAnsibleError as e:
             module.fail_json(msg=str(e), **result)
         module.exit_json(**result)
 
+    # most runs are re-applies of an unchanged configuration, try to prove that
+    # cheaply before doing the full device scan
+    with profiler.measure('noop_check'):
+        report = get_device_report(module)
+        noop_result = check_noop(module, report) if report is not None else None
+    if noop_result is not None:
+        if profiler.enabled:
+            noop_result.update(timings=result['timings'], action_counts=result['action_counts'])
+        module.exit_json(**noop_result)
+
+    if module.params['scan_exclusive_disks']:
+        set_up_exclusive_scan(b, report, module.params['pools'], module.params['volumes'])
+
+    device_index.watch()
+    with profiler.measure('reset'):
+        b.reset()
+    with profiler.measure('fstab'):
+        fstab = FSTab(b)
+    actions = list()
+
     def record_action(action):
         if action.is_format and action.format.type is None:
             return
@@ -2595,7 +3557,8 @@ def run_module():
                                  "same name: {1}".format(pool['name'], ",".join(duplicates)),
                              **result)
         try:
-            manage_pool(b, pool)
+            with profiler.measure_item(pool=pool['name']):
+                manage_pool(b, pool)
         except BlivetAnsibleError as e:
             module.fail_json(msg=str(e), **result)
 
@@ -2603,35 +3566,49 @@ def run_module():
     if duplicates:
         module.fail_json(msg="multiple volumes with the same name: {0}".format(",".join(duplicates)),
                          **result)
+    try:
+        unlock_volumes(b, [_get_blivet_volume(b, volume) for volume in module.params['volumes']])
+    except BlivetAnsibleError as e:
+        module.fail_json(msg=str(e), **result)
     for volume in module.params['volumes']:
         try:
-            manage_volume(b, volume)
+            with profiler.measure_item(volume=volume['name']):
+                manage_volume(b, volume)
         except BlivetAnsibleError as e:
             module.fail_json(msg=str(e), **result)
 
     scheduled = b.devicetree.actions.find()
     result['packages'] = b.packages[:]
 
+    if profiler.enabled:
+        for action in scheduled:
+            result['action_counts'][action.type_desc_str] = result['action_counts'].get(action.type_desc_str, 0) + 1
+
     for action in scheduled:
         if action.is_destroy and action.is_format and action.format.exists and \
            (action.format.mountable or action.format.type == "swap"):
             action.format.teardown()
 
     if scheduled:
-        # execute the scheduled actions, committing changes to disk
+        # execute the scheduled actions, committing changes to disk; they are
+        # not split into parallel groups since blivet's global lock serializes
+        # DeviceAction.execute anyway
         callbacks.action_executed.add(record_action)
         callbacks.action_executed.add(ensure_udev_update)
 
         try:
-            b.devicetree.actions.process(devices=b.devicetree.devices, dry_run=module.check_mode)
+            with profiler.measure('actions_process'):
+                b.devicetree.actions.process(devices=b.devicetree.devices, dry_run=module.check_mode)
         except Exception as e:
             module.fail_json(msg="Failed to commit changes to disk: %s" % str(e), **result)
         finally:
             result['changed'] = True
             result['actions'] = [action_dict(a) for a in actions]
 
-    update_fstab_identifiers(b, module.params['pools'], module.params['volumes'])
-    activate_swaps(b, module.params['pools'], module.params['volumes'])
+    with profiler.measure('update_fstab_identifiers'):
+        update_fstab_identifiers(b, module.params['pools'], module.params['volumes'])
+    with profiler.measure('activate_swaps'):
+        activate_swaps(b, module.params['pools'], module.params['volumes'])
 
     result['mounts'] = get_mount_info(module.params['pools'], module.params['volumes'], actions, fstab)
     result['crypts'] = get_crypt_info(actions)
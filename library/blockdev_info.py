@@ -37,9 +37,9 @@ info:
 '''
 
 import os
-import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.storage_lsr.lsblk import get_devices
 
 
 LSBLK_DEVICE_TYPES = {"part": "partition"}
@@ -47,32 +47,43 @@ DEV_MD_DIR = '/dev/md'
 DEV_STRATIS_DIR = '/dev/stratis'
 
 
-def _fixup_md_path(path):
-    if not os.path.exists(DEV_MD_DIR):
-        return path
+# realpath -> canonical path indexes, built on first use
+_path_indexes = dict()
 
-    ret = path
-    for md in os.listdir(DEV_MD_DIR):
-        md_path = "%s/%s" % (DEV_MD_DIR, md)
-        if os.path.realpath(md_path) == os.path.realpath(path):
-            ret = md_path
-            break
 
-    return ret
+def _md_path_index():
+    if DEV_MD_DIR not in _path_indexes:
+        index = dict()
+        if os.path.exists(DEV_MD_DIR):
+            for md in os.listdir(DEV_MD_DIR):
+                md_path = "%s/%s" % (DEV_MD_DIR, md)
+                index.setdefault(os.path.realpath(md_path), md_path)
+        _path_indexes[DEV_MD_DIR] = index
 
+    return _path_indexes[DEV_MD_DIR]
 
-def _fixup_stratis_path(path):
-    if not os.path.exists(DEV_STRATIS_DIR):
-        return path
 
-    ret = path
-    for pool in os.listdir(DEV_STRATIS_DIR):
-        for fs in os.listdir(os.path.join(DEV_STRATIS_DIR, pool)):
-            stratis_path = os.path.join(DEV_STRATIS_DIR, pool, fs)
-            if os.path.realpath(stratis_path) == os.path.realpath(path):
-                ret = stratis_path
-                break
-    return ret
+def _stratis_path_index():
+    if DEV_STRATIS_DIR not in _path_indexes:
+        index = dict()
+        if os.path.exists(DEV_STRATIS_DIR):
+            for pool in os.listdir(DEV_STRATIS_DIR):
+                pool_index = dict()
+                for fs in os.listdir(os.path.join(DEV_STRATIS_DIR, pool)):
+                    stratis_path = os.path.join(DEV_STRATIS_DIR, pool, fs)
+                    pool_index.setdefault(os.path.realpath(stratis_path), stratis_path)
+                index.update(pool_index)
+        _path_indexes[DEV_STRATIS_DIR] = index
+
+    return _path_indexes[DEV_STRATIS_DIR]
+
+
+def _fixup_md_path(path):
+    return _md_path_index().get(os.path.realpath(path), path)
+
+
+def _fixup_stratis_path(path):
+    return _stratis_path_index().get(os.path.realpath(path), path)
 
 
 def fixup_path(path):
@@ -85,23 +96,15 @@ def fixup_path(path):
 
 
 def get_block_info(module):
-    buf = module.run_command(["lsblk", "-o", "NAME,FSTYPE,LABEL,UUID,TYPE,SIZE,MOUNTPOINT", "-p", "-P", "-a"])[1]
     info = dict()
-    for line in buf.splitlines():
+    for device in get_devices(module.run_command, ["NAME", "FSTYPE", "LABEL", "UUID", "TYPE", "SIZE", "MOUNTPOINT"], ["-p", "-a"]):
         dev = dict()
-        for pair in shlex.split(line):
-            try:
-                key, _eq, value = pair.partition("=")
-            except ValueError:
-                module.log(pair)
-                raise
-            if key:
-                if key.lower() == "name":
-                    value = fixup_path(value)
-
-                dev[key.lower()] = LSBLK_DEVICE_TYPES.get(value, value)
-        if dev:
-            info[dev['name']] = dev
+        for key, value in device.items():
+            if key == "name":
+                value = fixup_path(value)
+
+            dev[key] = LSBLK_DEVICE_TYPES.get(value, value)
+        info[dev['name']] = dev
 
     return info
 
@@ -27,8 +27,17 @@ options:
     size:
         description:
             - String containing number and byte units
-        required: true
+            - Exactly one of I(size) and I(sizes) is required
+        required: false
         type: str
+    sizes:
+        description:
+            - List of strings containing number and byte units, all converted
+              in a single module run
+            - Exactly one of I(size) and I(sizes) is required
+        required: false
+        type: list
+        elements: str
 
 author:
     - Jan Pokorny (@japokorn)
@@ -39,36 +48,58 @@ EXAMPLES = '''
 - name: Get 10 KiB size
   bsize:
     size: 10 KiB
+
+- name: Get several sizes at once
+  bsize:
+    sizes:
+      - 10 KiB
+      - 1 GB
 '''
 
 RETURN = '''
 size:
     description: Size in binary format units
     type: str
-    returned: success
+    returned: success and I(size) was given
 bytes:
     description: Size in bytes
     type: int
-    returned: success
+    returned: success and I(size) was given
 lvm:
     description: Size in binary format. No space after the number,
                  first letter of unit prefix in lowercase only
     type: str
-    returned: success
+    returned: success and I(size) was given
 parted:
     description: Size in binary format. No space after the number
     type: str
-    returned: success
+    returned: success and I(size) was given
+sizes:
+    description: List with the I(size), I(bytes), I(lvm) and I(parted)
+                 values for each of the I(sizes), in the same order
+    type: list
+    elements: dict
+    returned: success and I(sizes) was given
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.storage_lsr.size import Size
 
 
+def convert_size(value):
+    """ return the size in the formats used by the storage tools """
+    size = Size(value)
+    return dict(size=size.to_human(),
+                bytes=size.bytes,
+                lvm=size.to_lvm(),
+                parted=size.to_parted())
+
+
 def run_module():
     # available arguments/parameters that a user can pass
     module_args = dict(
-        size=dict(type='str', required=True),
+        size=dict(type='str', required=False),
+        sizes=dict(type='list', elements='str', required=False),
     )
 
     # seed the result dict in the object
@@ -77,14 +108,14 @@ def run_module():
     )
 
     module = AnsibleModule(argument_spec=module_args,
+                           mutually_exclusive=[('size', 'sizes')],
+                           required_one_of=[('size', 'sizes')],
                            supports_check_mode=True)
 
-    size = Size(module.params['size'])
-
-    result['size'] = size.get(fmt="%d %sb")
-    result['bytes'] = size.bytes
-    result['lvm'] = size.get(fmt="%d%sb").lower()[:-2]
-    result['parted'] = size.get(fmt="%d%sb")
+    if module.params['sizes'] is not None:
+        result['sizes'] = [convert_size(value) for value in module.params['sizes']]
+    else:
+        result.update(convert_size(module.params['size']))
 
     # use whatever logic you need to determine whether or not this module
     # made any modifications to your target
@@ -84,11 +84,14 @@ import os
 import re
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.storage_lsr.lsblk import get_devices
 from ansible.module_utils.storage_lsr.size import Size
 
 
 SYS_CLASS_BLOCK = "/sys/class/block/"
 IGNORED_DEVICES = [re.compile(r'^/dev/nullb\d+$')]
+# PTTYPE and PTUUID describe a partition table, which is not a reason to skip the disk
+SIGNATURE_TAG = re.compile(r'\b(UUID|TYPE)=')
 
 
 def is_ignored(disk_path):
@@ -96,17 +99,45 @@ def is_ignored(disk_path):
     return any(ignore.match(sys_path) is not None for ignore in IGNORED_DEVICES)
 
 
-def is_device_interface(module, path, interface):
-    device = path.split('dev/')[-1]
-    # command checks if the device uses given interface (virtio, scsi or nvme)
-    result = module.run_command(['readlink', '/sys/block/%s/device/device/driver' % device, '/sys/block/%s/device/driver' % device])
-    return interface in result[1]
+def get_driver_links(sys_name):
+    """Return the driver link targets of the device the way readlink prints them."""
+    targets = list()
+    for link in ('/device/device/driver', '/device/driver'):
+        try:
+            targets.append(os.readlink(SYS_CLASS_BLOCK + sys_name + link))
+        except OSError:
+            pass
 
+    return '\n'.join(targets)
 
-def no_signature(run_command, disk_path):
-    """Return true if no known signatures exist on the disk."""
-    signatures = run_command(['blkid', '-p', disk_path])
-    return 'UUID' not in signatures[1]
+
+def is_device_interface(drivers, interface):
+    # checks if the device uses given interface (virtio, scsi or nvme)
+    return interface in drivers
+
+
+def get_signatures(run_command, disk_paths):
+    """Probe all the disks for signatures with a single blkid call.
+
+    Returns a dict mapping each disk path to the tags blkid printed for it,
+    disks without any signature map to an empty string.
+    """
+    signatures = dict((path, '') for path in disk_paths)
+    if not signatures:
+        return signatures
+
+    buf = run_command(['blkid', '-p'] + list(disk_paths))[1]
+    for line in buf.splitlines():
+        path, dummy, tags = line.partition(': ')
+        if path in signatures:
+            signatures[path] = tags
+
+    return signatures
+
+
+def has_signature(tags):
+    """Return true if the blkid tags describe a known signature other than a partition table."""
+    return SIGNATURE_TAG.search(tags) is not None
 
 
 def no_holders(disk_path):
@@ -132,88 +163,172 @@ def get_sys_name(disk_path):
     return os.path.normpath(node_dir + '/' + os.readlink(disk_path))
 
 
-def get_partitions(disk_path, info):
-    sys_name = get_sys_name(disk_path)
-    partitions = list()
-    for filename in os.listdir(SYS_CLASS_BLOCK + sys_name):
-        if re.match(sys_name + r'p?\d+$', filename):
-            info.append("filename [%s] is a partition" % filename)
-            partitions.append(filename)
+def get_partitions(sys_name, entries):
+    return [filename for filename in entries if re.match(sys_name + r'p?\d+$', filename)]
 
-    return partitions
+
+def read_sysfs(disk_path):
+    """Read the sysfs attributes needed to qualify the disk.
+
+    Partitions, holders and driver links are read with plain system calls,
+    so no subprocess has to be run for the disk.
+    """
+    sys_name = get_sys_name(disk_path)
+    return dict(partitions=get_partitions(sys_name, os.listdir(SYS_CLASS_BLOCK + sys_name)),
+                no_holders=no_holders(sys_name),
+                drivers=get_driver_links(sys_name))
 
 
 def get_disks(module, info):
-    buf = module.run_command(["lsblk", "-p", "--pairs", "--bytes", "-o", "NAME,TYPE,SIZE,FSTYPE,LOG-SEC"])[1]
     disks = dict()
-    for line in buf.splitlines():
-        info.append("Line: %s" % line)
-        if not line:
-            continue
-
-        m = re.search(r'NAME="(?P<path>[^"]*)" TYPE="(?P<type>[^"]*)" SIZE="(?P<size>\d+)" FSTYPE="(?P<fstype>[^"]*)" LOG[_-]SEC="(?P<ssize>\d+)"', line)
-        if m is None:
-            module.log("Line did not match: " + line)
-            info.append("Line did not match: %s" % line)
+    for device in get_devices(module.run_command, ["NAME", "TYPE", "SIZE", "FSTYPE", "LOG-SEC"], ["-p", "--bytes"]):
+        # most devices are not disks, keep their info entries cheap
+        if device.get("type") != "disk":
+            info.append("Device [%s] type [%s] is not disk" % (device.get("name"), device.get("type")))
             continue
 
-        if m.group('type') != "disk":
-            info.append("Line type [%s] is not disk: %s" % (m.group('type'), line))
+        info.append("Device [%s] type [%s] size [%s] fstype [%s] log-sec [%s]"
+                    % (device.get("name"), device.get("type"), device.get("size"), device.get("fstype"),
+                       device.get("log-sec")))
+        if "name" not in device or "fstype" not in device or \
+           not device.get("size", "").isdigit() or not device.get("log-sec", "").isdigit():
+            module.log("Device did not match: %s" % device)
+            info.append("Device did not match: %s" % device)
             continue
 
-        disks[m.group('path')] = {"type": m.group('type'), "size": m.group('size'),
-                                  "fstype": m.group('fstype'), "ssize": m.group('ssize')}
+        disks[device["name"]] = {"type": device["type"], "size": device["size"],
+                                 "fstype": device["fstype"], "ssize": device["log-sec"]}
 
     return disks
 
 
-def filter_disks(module):
-    disks = {}
-    info = []
+def get_candidates(module, all_disks, info):
+    """Return the disks passing the checks that only need the lsblk output.
+
+    The candidates are sorted by their kernel name, which is the order the
+    unused disks are returned in.
+    """
+    candidates = []
+    min_size = Size(module.params['min_size'])
     max_size = Size(module.params['max_size'])
 
-    for path, attrs in get_disks(module, info).items():
+    for path in sorted(all_disks, key=os.path.basename):
+        attrs = all_disks[path]
         if is_ignored(path):
             info.append('Disk [%s] attrs [%s] is ignored' % (path, attrs))
             continue
 
-        interface = module.params['with_interface']
-
-        # do not use nvme unless explicitly asked to
-        if interface is not None and not is_device_interface(module, path, interface) or \
-           interface is None and is_device_interface(module, path, 'nvme'):
-            info.append('Disk [%s] attrs [%s] is not an interface [%s]' % (path, attrs, interface))
-            continue
-
         if attrs["fstype"]:
             info.append('Disk [%s] attrs [%s] has fstype' % (path, attrs))
             continue
 
-        if Size(attrs["size"]).bytes < Size(module.params['min_size']).bytes:
+        size = Size(attrs["size"])
+        if size < min_size:
             info.append('Disk [%s] attrs [%s] size is less than requested' % (path, attrs))
             continue
 
-        if max_size.bytes > 0 and Size(attrs["size"]).bytes > max_size.bytes:
+        if max_size.bytes > 0 and size > max_size:
             info.append('Disk [%s] attrs [%s] size is greater than requested' % (path, attrs))
             continue
 
-        if get_partitions(path, info):
-            info.append('Disk [%s] attrs [%s] has partitions' % (path, attrs))
-            continue
+        candidates.append((path, attrs))
 
-        if not no_holders(get_sys_name(path)):
-            info.append('Disk [%s] attrs [%s] has holders' % (path, attrs))
-            continue
+    return candidates
 
-        if not can_open(path):
-            info.append('Disk [%s] attrs [%s] cannot be opened exclusively' % (path, attrs))
-            continue
 
-        disks[path] = attrs
+def qualify_disks(module, candidates, info, limit=None):
+    """Yield the candidates that pass the remaining, more expensive, checks.
+
+    The candidates are examined in order and their signatures are probed in
+    batches of the number of disks still needed, so with a limit no more
+    disks are examined than necessary.
+    """
+    interface = module.params['with_interface']
+    candidates = iter(candidates)
+    found = 0
+
+    while limit is None or found < limit:
+        batch = []
+        for path, attrs in candidates:
+            sysfs = read_sysfs(path)
+
+            # do not use nvme unless explicitly asked to
+            if interface is not None and not is_device_interface(sysfs['drivers'], interface) or \
+               interface is None and is_device_interface(sysfs['drivers'], 'nvme'):
+                info.append('Disk [%s] attrs [%s] is not an interface [%s]' % (path, attrs, interface))
+                continue
+
+            if sysfs['partitions']:
+                info.extend("filename [%s] is a partition" % filename for filename in sysfs['partitions'])
+                info.append('Disk [%s] attrs [%s] has partitions' % (path, attrs))
+                continue
+
+            if not sysfs['no_holders']:
+                info.append('Disk [%s] attrs [%s] has holders' % (path, attrs))
+                continue
+
+            batch.append((path, attrs))
+            if limit is not None and len(batch) >= limit - found:
+                break
+
+        if not batch:
+            return
+
+        signatures = get_signatures(module.run_command, [path for path, attrs in batch])
+        for path, attrs in batch:
+            if has_signature(signatures[path]):
+                info.append('Disk [%s] attrs [%s] has signature [%s]' % (path, attrs, signatures[path]))
+                continue
+
+            if not can_open(path):
+                info.append('Disk [%s] attrs [%s] cannot be opened exclusively' % (path, attrs))
+                continue
+
+            found += 1
+            yield path, attrs
+
+
+def filter_disks(module, limit=None):
+    """Return the unused disks (at most limit of them, the first by name) and the info log."""
+    info = []
+    candidates = get_candidates(module, get_disks(module, info), info)
+    disks = dict(qualify_disks(module, candidates, info, limit))
 
     return disks, info
 
 
+def filter_disks_by_sector_size(module):
+    """Return the largest group of unused disks with the same (logical) sector size.
+
+    Groups are qualified from the largest number of candidates down and the
+    search stops once no remaining group can match the best one found. Among
+    groups of equal size the one whose first disk comes first in the lsblk
+    output wins.
+    """
+    info = []
+    all_disks = get_disks(module, info)
+    position = dict((path, idx) for idx, path in enumerate(all_disks))
+
+    groups = dict()
+    for path, attrs in get_candidates(module, all_disks, info):
+        groups.setdefault(attrs["ssize"], []).append((path, attrs))
+
+    best, best_key = [], None
+    for members in sorted(groups.values(), key=len, reverse=True):
+        if len(members) < len(best):
+            break
+
+        qualified = list(qualify_disks(module, members, info))
+        if not qualified:
+            continue
+
+        key = (len(qualified), -min(position[path] for path, attrs in qualified))
+        if best_key is None or key > best_key:
+            best, best_key = qualified, key
+
+    return dict(best), info
+
+
 def run_module():
     """Create the module"""
     module_args = dict(
@@ -235,19 +350,14 @@ def run_module():
         supports_check_mode=True
     )
 
-    disks, info = filter_disks(module)
-
     if module.params['match_sector_size']:
         # pick the most disks with the same sector size
-        sector_sizes = dict()
-        for path, ss in [(path, disks[path]["ssize"]) for path in disks.keys()]:
-            if ss in sector_sizes.keys():
-                sector_sizes[ss].append(path)
-            else:
-                sector_sizes[ss] = [path]
-        disks = [os.path.basename(p) for p in max(sector_sizes.values(), key=len)]
+        disks, info = filter_disks_by_sector_size(module)
     else:
-        disks = [os.path.basename(p) for p in disks.keys()]
+        max_return = int(module.params['max_return'])
+        disks, info = filter_disks(module, limit=max_return if max_return > 0 else None)
+
+    disks = [os.path.basename(p) for p in disks.keys()]
 
     if not disks:
         result['disks'] = "Unable to find unused disk"
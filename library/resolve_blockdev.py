@@ -23,8 +23,18 @@ options:
     spec:
         description:
             - String describing a block device
-        required: true
+            - Exactly one of I(spec) and I(specs) is required
+        required: false
         type: str
+    specs:
+        description:
+            - List of strings describing block devices, all resolved in a single
+              module run sharing one C(blkid) call and one scan of the device
+              directories
+            - Exactly one of I(spec) and I(specs) is required
+        required: false
+        type: list
+        elements: str
 author:
     - David Lehman (@dwlehman)
 '''
@@ -41,13 +51,23 @@ EXAMPLES = '''
 - name: Resolve device by /dev/disk/by-id symlink name
   resolve_blockdev:
     spec: wwn-0x5000c5005bc37f3f
+
+- name: Resolve several devices at once
+  resolve_blockdev:
+    specs:
+      - LABEL=MyData
+      - mpathb
 '''
 
 RETURN = '''
 device:
     description: Path to block device node
     type: str
-    returned: success
+    returned: success and I(spec) was given
+devices:
+    description: Dict mapping each of the I(specs) to its block device node path
+    type: dict
+    returned: success and I(specs) was given
 '''
 
 import glob
@@ -59,38 +79,165 @@ from ansible.module_utils.basic import AnsibleModule
 DEV_MD = "/dev/md"
 DEV_MAPPER = "/dev/mapper"
 SYS_CLASS_BLOCK = "/sys/class/block"
-SEARCH_DIRS = ['/dev', DEV_MAPPER, DEV_MD] + glob.glob("/dev/disk/by-*")
+DEV_DISK_BY = "/dev/disk/by-*"
 MD_KERNEL_DEV = re.compile(r'/dev/md\d+(p\d+)?$')
+BACKSLASH_ESCAPE = re.compile(r'\\(.)')
+
+
+# search dirs and the name -> path index over them, built on first use
+_search_cache = dict()
+
+
+def get_search_dirs():
+    if 'dirs' not in _search_cache:
+        _search_cache['dirs'] = ['/dev', DEV_MAPPER, DEV_MD] + glob.glob(DEV_DISK_BY)
+
+    return _search_cache['dirs']
+
+
+def get_name_index():
+    """ Return a dict mapping entry names to their path in the first search dir listing them. """
+    if 'index' not in _search_cache:
+        index = dict()
+        for devdir in get_search_dirs():
+            try:
+                names = os.listdir(devdir)
+            except OSError:
+                continue
+
+            for name in names:
+                index.setdefault(name, "%s/%s" % (devdir, name))
+        _search_cache['index'] = index
+
+    return _search_cache['index']
+
+
+def _find_in_search_dirs(spec):
+    device = get_name_index().get(spec)
+    if device and os.path.exists(device):
+        return device
+
+    # broken links, nodes that appeared since the index was built and specs
+    # with a directory part like mapper/vg-lv
+    for devdir in get_search_dirs():
+        device = "%s/%s" % (devdir, spec)
+        if os.path.exists(device):
+            return device
+
+    return ''
+
+
+def _canonical_path(device):
+    if not device or not os.path.exists(device):
+        return ''
+
+    return canonical_device(os.path.realpath(device))
 
 
 def resolve_blockdev(spec, run_cmd):
     if "=" in spec:
         device = run_cmd("blkid -t %s -o device" % spec)[1].strip()
     elif not spec.startswith('/'):
-        for devdir in SEARCH_DIRS:
-            device = "%s/%s" % (devdir, spec)
-            if os.path.exists(device):
-                break
-            else:
-                device = ''
+        device = _find_in_search_dirs(spec)
     else:
         device = spec
 
-    if not device or not os.path.exists(device):
-        return ''
-
-    return canonical_device(os.path.realpath(device))
+    return _canonical_path(device)
+
+
+def get_blkid_tags(run_cmd):
+    """ Return a dict mapping (KEY, value) tags to the devices that carry them. """
+    tags = dict()
+    device = None
+    for line in run_cmd("blkid -o export")[1].splitlines():
+        key, _eq, value = line.partition("=")
+        if not key:
+            # devices are separated by empty lines
+            device = None
+        elif key == "DEVNAME":
+            device = value
+        elif device:
+            # the export format escapes special characters with a backslash
+            tags.setdefault((key, BACKSLASH_ESCAPE.sub(r'\1', value)), list()).append(device)
+
+    return tags
+
+
+def resolve_blockdevs(specs, run_cmd):
+    """ Resolve many specs, sharing one blkid dump and one scan of the search dirs.
+
+        Returns a dict mapping each spec to its canonical device path, or to
+        an empty string if it could not be resolved.
+    """
+    tags = None
+    devices = dict()
+    for spec in specs:
+        if spec in devices:
+            continue
+
+        if "=" in spec:
+            if tags is None:
+                tags = get_blkid_tags(run_cmd)
+            key, _eq, value = spec.partition("=")
+            if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+                value = value[1:-1]
+            # like blkid -t, an ambiguous tag does not resolve to any device
+            matches = tags.get((key, value), list())
+            device = matches[0] if len(matches) == 1 else ''
+        elif not spec.startswith('/'):
+            device = _find_in_search_dirs(spec)
+        else:
+            device = spec
+
+        try:
+            devices[spec] = _canonical_path(device)
+        except Exception:
+            devices[spec] = ''
+
+    return devices
+
+
+# kernel name -> dm name and dev_t -> md name maps, built on first use
+_name_maps = dict()
+
+
+def _dm_names():
+    if 'dm' not in _name_maps:
+        names = dict()
+        for kname in os.listdir(SYS_CLASS_BLOCK):
+            if not kname.startswith("dm-"):
+                continue
+
+            try:
+                with open("%s/%s/dm/name" % (SYS_CLASS_BLOCK, kname)) as f:
+                    names[kname] = f.read().strip()
+            except (IOError, OSError):
+                continue
+        _name_maps['dm'] = names
+
+    return _name_maps['dm']
+
+
+def _md_names():
+    if 'md' not in _name_maps:
+        names = dict()
+        if os.path.isdir(DEV_MD):
+            for name in os.listdir(DEV_MD):
+                try:
+                    names.setdefault(os.stat("%s/%s" % (DEV_MD, name)).st_rdev, name)
+                except OSError:
+                    continue
+        _name_maps['md'] = names
+
+    return _name_maps['md']
 
 
 def _get_dm_name_from_kernel_dev(kdev):
-    with open("%s/%s/dm/name" % (SYS_CLASS_BLOCK, os.path.basename(kdev))) as f:
-        return f.read().strip()
+    return _dm_names()[os.path.basename(kdev)]
 
 
 def _get_md_name_from_kernel_dev(kdev):
-    minor = os.minor(os.stat(kdev).st_rdev)
-    return next(name for name in os.listdir(DEV_MD)
-                if os.minor(os.stat("%s/%s" % (DEV_MD, name)).st_rdev) == minor)
+    return _md_names()[os.stat(kdev).st_rdev]
 
 
 def canonical_device(device):
@@ -103,18 +250,28 @@ def canonical_device(device):
 
 def run_module():
     module_args = dict(
-        spec=dict(type='str', required=True)
+        spec=dict(type='str', required=False),
+        specs=dict(type='list', elements='str', required=False)
     )
 
-    result = dict(
-        device=None,
-    )
+    result = dict()
 
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('spec', 'specs')],
+        required_one_of=[('spec', 'specs')],
         supports_check_mode=True
     )
 
+    if module.params['specs'] is not None:
+        result['devices'] = resolve_blockdevs(module.params['specs'], run_cmd=module.run_command)
+        missing = [spec for spec, device in result['devices'].items() if not device]
+        if missing:
+            module.fail_json(msg="The {0} device specs could not be resolved".format(", ".join(sorted(missing))))
+
+        module.exit_json(**result)
+
+    result['device'] = None
     try:
         result['device'] = resolve_blockdev(module.params['spec'], run_cmd=module.run_command)
     except Exception:
@@ -186,46 +186,6 @@ def _validate_parameters(argument_spec, parameters, error_log=None, updated_para
     return (error_log, updated_params)
 
 
-def generate_combinations(input_list):
-    # Create list of all valid combinations of parameters
-    # (Note: 'valid' means 'worth exploring')
-
-    # Fill in the stack with the first item to expand
-    stack = [[{'path': input_list[0]['path'],
-               'indices': x,
-               'backtrack_indices': input_list[0]['backtrack_indices']}]
-             for x in input_list[0]['indices']]
-
-    result = []
-
-    while stack:
-        sequence = stack.pop()
-        for item in input_list[len(sequence)]['indices']:
-            new_sequence = sequence + [{'path': input_list[len(sequence)]['path'],
-                                        'indices': item,
-                                        'backtrack_indices': input_list[len(sequence)]['backtrack_indices']}]
-            if len(new_sequence) < len(input_list):
-                stack.append(new_sequence)
-            else:
-                # sequence is complete, now to make sure the combination is valid
-
-                # 'valid' means that all the same path roots have the same indices
-                indices_pairs = {}
-                for rule in new_sequence:
-                    encountered_index = indices_pairs.get(rule['path'][0], -1)
-                    if encountered_index == -1:
-                        # path not yet encountered
-                        indices_pairs[rule['path'][0]] = rule['indices'][0]
-                    elif encountered_index != rule['indices'][0]:
-                        # invalid combination
-                        break
-                else:
-                    # for loop ended without break - combination is valid
-                    result.append(new_sequence)
-
-    return result
-
-
 def locate_parameter(params, path, param_value):
     # path: complete path of searched parameter e.g. "['pools', 'volumes', 'deduplication']"
     # param_value: list of searched values or [] if value doesn't matter
@@ -270,20 +230,61 @@ def locate_parameter(params, path, param_value):
     return result
 
 
-def format_result(combo):
-    rules_list = list()
-    for rule in combo:
-        path_list = rule['path'][0].split('.')
-        indices = rule['backtrack_indices']
+def _join_keys(path, levels):
+    # A rule is identified by its path prefix at each nesting level, the
+    # rules with the same prefix at a level have to share the index there.
+    # Returns list of ((level, path prefix), position in the indices)
+    last = len(path) - 1
+    return [((level, '.'.join(path[:min(level, last) + 1])), min(level, last)) for level in range(levels)]
 
-        rule_str = ""
-        for i in range(len(path_list)):
-            rule_str += path_list[i]
-            if i < len(indices) and indices[i] is not None:
-                rule_str += '[' + str(indices[i]) + ']'
-            rule_str += '.'
-        rules_list.append(rule_str[:-1])
-    return rules_list
+
+def join_matches(matches):
+    # matches: list of locate_parameter() results, one per rule
+    # returns list of combinations of indices (one item per rule) whose rules
+    # point into the same pools (volumes, ...)
+
+    # Hash join the rules one after the other: the indices of each rule are
+    # indexed by the keys already bound by the previous rules, so each partial
+    # combination is only extended by the matching indices.
+    levels = max(len(match['path']) for match in matches)
+    partials = [(dict(), list())]
+    bound = set()
+
+    for num, match in enumerate(matches):
+        keys = _join_keys(match['path'], levels)
+        shared = [(key, pos) for key, pos in keys if key in bound]
+        added = [(key, pos) for key, pos in keys if key not in bound]
+
+        indices = match['indices']
+        if num == len(matches) - 1:
+            # keep the order the combinations have always been reported in
+            indices = reversed(indices)
+        index = dict()
+        for item in indices:
+            index.setdefault(tuple(item[pos] for dummy, pos in shared), list()).append(item)
+
+        joined = list()
+        for binding, combination in partials:
+            for item in index.get(tuple(binding[key] for key, dummy in shared), list()):
+                new_binding = dict(binding)
+                new_binding.update((key, item[pos]) for key, pos in added)
+                joined.append((new_binding, combination + [item]))
+
+        partials = joined
+        bound.update(key for key, dummy in added)
+
+    return [combination for dummy, combination in partials]
+
+
+def format_result(path, indices):
+    # e.g. "pools[1].volumes[0].encryption"
+    rule_str = ""
+    for i in range(len(path)):
+        rule_str += path[i]
+        if i < len(path) - 1 and indices[i] is not None:
+            rule_str += '[' + str(indices[i]) + ']'
+        rule_str += '.'
+    return rule_str[:-1]
 
 
 def check_param_combos(params):
@@ -291,7 +292,6 @@ def check_param_combos(params):
 
     for combo in UNSUPPORTED_COMBOS:
 
-        found_combos = list()
         recorded_matches = list()
 
         for key, value in combo['options'].items():
@@ -303,43 +303,10 @@ def check_param_combos(params):
                 recorded_matches.append(found)
         else:
             # No break happened in loop => need to check result combinations
-
-            for match in recorded_matches:
-                match['backtrack_indices'] = list()
-
-            stack = [recorded_matches]
-
-            while stack:
-                match = stack.pop()
-                combinations = generate_combinations(match)
-
-                # It is now possible to dive by shifting the root one level
-                for combination in combinations:
-                    shifted_combo = list()
-                    combo_found = True
-                    for rule in combination:
-                        if len(rule['path']) > 1:
-                            path = rule['path'][1:]
-                            path[0] = rule['path'][0] + '.' + path[0]
-                            indices = [rule['indices'][1:]]
-                            backtrack_indices = rule['backtrack_indices'] + [rule['indices'][0]]
-                            combo_found = False
-                        else:
-                            path = rule['path']
-                            indices = [rule['indices']]
-                            backtrack_indices = rule['backtrack_indices']
-
-                        shifted_combo.append({'path': path,
-                                              'indices': indices,
-                                              'backtrack_indices': backtrack_indices})
-
-                    if combo_found:
-                        # Forbidden combination of parameters confirmed
-                        found_combos.append(format_result(combination))
-                    else:
-                        stack.append(shifted_combo)
-        if found_combos != list():
-            all_combos.append({'matches': found_combos, 'msg': combo['err_msg']})
+            found_combos = [[format_result(match['path'], indices) for match, indices in zip(recorded_matches, combination)]
+                            for combination in join_matches(recorded_matches)]
+            if found_combos != list():
+                all_combos.append({'matches': found_combos, 'msg': combo['err_msg']})
 
     return all_combos
 
@@ -0,0 +1,137 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import binascii
+import itertools
+import json
+import operator
+import re
+
+# KEY="value" pairs of the lsblk --pairs output, lsblk escapes quotes in values
+PAIR = re.compile(r'([^\s=]+)="([^"]*)"')
+# lsblk --pairs escapes unsafe characters (e.g. spaces) as \xNN
+ESCAPED_BYTES = re.compile(r'(?:\\x[0-9a-fA-F]{2})+')
+
+
+def _unescape(match):
+    return binascii.unhexlify(match.group(0).replace('\\x', '')).decode('utf-8', 'replace')
+
+
+def _normalize_key(key):
+    # older lsblk versions print LOG_SEC instead of LOG-SEC in the pairs output
+    return key.lower().replace('_', '-')
+
+
+def _normalize_value(value):
+    # lsblk --json uses null, booleans and numbers where --pairs prints strings
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+
+def _make_devices(names, rows):
+    # dict(zip()) for every row, without running a Python loop per row
+    return list(map(dict, map(zip, itertools.repeat(names), rows)))
+
+
+def _parse_pair_lines(buf):
+    devices = list()
+    for line in buf.splitlines():
+        device = dict()
+        for key, value in PAIR.findall(line):
+            if '\\x' in value:
+                value = ESCAPED_BYTES.sub(_unescape, value)
+            device[_normalize_key(key)] = value
+        if device:
+            devices.append(device)
+
+    return devices
+
+
+def parse_pairs(buf):
+    """Parse lsblk --pairs output into a list of dicts, one per device."""
+    buf = buf.strip('\n')
+    keys = [key for key, dummy in PAIR.findall(buf.split('\n', 1)[0])]
+    if not keys:
+        return _parse_pair_lines(buf)
+
+    # lsblk prints the same columns in the same order on every line, so the
+    # whole output is matched at once by a pattern built from the first line;
+    # anything else (e.g. a line that does not match) takes the slow path
+    line = re.compile('^' + ' '.join('%s="([^"]*)"' % re.escape(key) for key in keys) + '$', re.M)
+    rows = line.findall(buf)
+    if len(rows) != buf.count('\n') + 1:
+        return _parse_pair_lines(buf)
+    if len(keys) == 1:
+        rows = [(value,) for value in rows]
+
+    # only the few rows with escaped values are decoded, found by their
+    # line number in the output
+    pos = buf.find('\\x')
+    last = idx = 0
+    decoded = None
+    while pos != -1:
+        idx += buf.count('\n', last, pos)
+        if idx != decoded:
+            rows[idx] = tuple(ESCAPED_BYTES.sub(_unescape, value) if '\\x' in value else value
+                              for value in rows[idx])
+            decoded = idx
+        last = pos
+        pos = buf.find('\\x', pos + 2)
+
+    return _make_devices([_normalize_key(key) for key in keys], rows)
+
+
+def parse_json(buf):
+    """Parse lsblk --json --list output into a list of dicts, one per device."""
+    devices = json.loads(buf)['blockdevices']
+    keys = list(devices[0]) if devices else []
+    if any(len(device) != len(keys) for device in devices):
+        keys = None
+
+    if keys:
+        # lsblk prints the same keys for every device, normalize them one
+        # column at a time and only the columns that are not all strings
+        for key in keys:
+            values = list(map(operator.itemgetter(key), devices))
+            if set(map(type, values)) != set([str]):
+                for device, value in zip(devices, values):
+                    device[key] = _normalize_value(value)
+
+        names = [_normalize_key(key) for key in keys]
+        if names != keys:
+            devices = _make_devices(names, ([device[key] for key in keys] for device in devices))
+        return devices
+
+    return [dict((_normalize_key(key), _normalize_value(value)) for key, value in device.items())
+            for device in devices]
+
+
+# whether lsblk accepts --json, found out by the first get_devices() call
+_lsblk_cache = dict()
+
+
+def get_devices(run_command, columns, options=None):
+    """Run lsblk once and return a list of dicts, one per device, in the lsblk order.
+
+    The keys are the lowercase column names and the values are strings, the
+    same for both output formats. The JSON output is used when lsblk supports
+    it, the --pairs output otherwise. An lsblk that rejected --json, or whose
+    JSON output did not parse, is not asked for it again.
+    """
+    args = ['lsblk', '-o', ','.join(columns)] + list(options or [])
+    if _lsblk_cache.get('json', True):
+        rc, buf, dummy = run_command(args + ['--json', '--list'])
+        if rc == 0:
+            try:
+                return parse_json(buf)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+        _lsblk_cache['json'] = False
+
+    return parse_pairs(run_command(args + ['--pairs'])[1])
@@ -3,6 +3,14 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import re
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+from functools import total_ordering
+
+try:
+    from functools import lru_cache
+except ImportError:  # Python 2
+    lru_cache = None
 
 DECIMAL_FACTOR = 10**3
 BINARY_FACTOR = 2**10
@@ -19,22 +27,146 @@ PREFIXES_BINARY = [
 ]
 SUFFIXES = ["bytes", "byte", "B"]
 
+SIZE_INPUT = re.compile(r"^(.*?)([^0-9]*)$")
+UNITS_CACHE_SIZE = 256
+
+
+def _prefix_table(prefixes):
+    """ map the lowercase prefixes to their position in the PREFIXES_* lists """
+    table = dict()
+    for lst in prefixes:
+        for idx, prefix in enumerate(lst):
+            table.setdefault(prefix.lower(), idx + 1)
+    return table
+
+
+_DECIMAL_TABLE = _prefix_table(PREFIXES_DECIMAL)
+_BINARY_TABLE = _prefix_table(PREFIXES_BINARY)
+_SUFFIXES_LOWER = [suffix.lower() for suffix in SUFFIXES]
+
+
+def _memoize_units(func):
+    """ cache the parsed unit strings, there are only a few distinct ones """
+    if lru_cache is not None:
+        return lru_cache(maxsize=UNITS_CACHE_SIZE)(func)
+
+    cache = dict()
+
+    def wrapper(raw_units):
+        if raw_units not in cache:
+            if len(cache) >= UNITS_CACHE_SIZE:
+                cache.clear()
+            cache[raw_units] = func(raw_units)
+        return cache[raw_units]
+
+    return wrapper
+
+
+@_memoize_units
+def parse_units(raw_units):
+    """
+    gets string containing size units and
+    returns *_FACTOR (BINARY or DECIMAL) and the prefix position (not index!)
+    in the PREFIXES_* list
+    If no unit is specified defaults to BINARY and Bytes
+    """
+
+    prefix = raw_units.lower()
+    no_suffix_flag = True
+
+    # get rid of possible units suffix ('bytes', 'b' or 'B')
+    for suffix in _SUFFIXES_LOWER:
+        if prefix.endswith(suffix):
+            no_suffix_flag = False
+            prefix = prefix[: -len(suffix)]
+            break
 
+    if prefix == "":
+        # no unit was specified, use default
+        return BINARY_FACTOR, 0
+
+    position = _DECIMAL_TABLE.get(prefix)
+    if position is not None and not no_suffix_flag:
+        return DECIMAL_FACTOR, position
+
+    # without the 'b'/'bytes' suffix even the decimal prefixes mean binary units
+    position = _BINARY_TABLE.get(prefix, position)
+    if position is None:
+        raise ValueError("Unable to identify unit '%s'" % raw_units)
+
+    return BINARY_FACTOR, position
+
+
+@total_ordering
 class Size(object):
-    """Class for basic manipulation of the sizes in *bytes"""
+    """Class for basic manipulation of the sizes in *bytes
+
+    The size is normalized to an int number of bytes when the object is
+    created, sizes compare, hash, add and subtract as their byte counts.
+    A Size is never equal to a plain number, ordering or adding/subtracting
+    a Size and a plain number raises TypeError.
+    """
+
+    __slots__ = ("factor", "exponent", "number", "units", "bytes")
 
     def __init__(self, value):
-        raw_number, raw_units = self._parse_input(str(value))
+        value = str(value)
+        if value.isdigit():
+            # plain number of bytes, e.g. lsblk -b output
+            raw_number, raw_units = value, ""
+        else:
+            raw_number, raw_units = self._parse_input(value)
         self.factor, self.exponent = self._parse_units(raw_units)
         self.number = self._parse_number(raw_number)
 
         self.units = raw_units
+        # size value in bytes as int, computed without float rounding
+        self.bytes = self._exact_bytes(self.number, self.factor**self.exponent)
+
+    @classmethod
+    def from_bytes(cls, value):
+        """create Size from an int number of bytes without parsing it"""
+        size = cls.__new__(cls)
+        size.factor, size.exponent, size.units = BINARY_FACTOR, 0, ""
+        size.number = size.bytes = int(value)
+        return size
+
+    def __repr__(self):
+        return "Size(%d)" % self.bytes
+
+    def __eq__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return self.bytes == other.bytes
+
+    def __ne__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return self.bytes != other.bytes
+
+    def __lt__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return self.bytes < other.bytes
+
+    def __hash__(self):
+        return hash(self.bytes)
+
+    def __add__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return Size.from_bytes(self.bytes + other.bytes)
+
+    def __sub__(self, other):
+        if not isinstance(other, Size):
+            return NotImplemented
+        return Size.from_bytes(self.bytes - other.bytes)
 
     def _parse_input(self, value):
         """splits input string into number and unit parts
         returns number part, unit part
         """
-        m = re.search("^(.*?)([^0-9]*)$", value)
+        m = SIZE_INPUT.search(value)
 
         raw_number = m.group(1).strip()
         if raw_number == "":
@@ -45,62 +177,36 @@ class Size(object):
         return raw_number, raw_units
 
     def _parse_units(self, raw_units):
-        """
-        gets string containing size units and
-        returns *_FACTOR (BINARY or DECIMAL) and the prefix position (not index!)
-        in the PREFIXES_* list
-        If no unit is specified defaults to BINARY and Bytes
-        """
-
-        prefix = raw_units
-        no_suffix_flag = True
-        valid_suffix = False
-        used_factor = BINARY_FACTOR
-
-        # get rid of possible units suffix ('bytes', 'b' or 'B')
-        for suffix in SUFFIXES:
-            if raw_units.lower().endswith(suffix.lower()):
-                no_suffix_flag = False
-                prefix = raw_units[: -len(suffix)]
-                break
-
-        if prefix == "":
-            # no unit was specified, use default
-            return BINARY_FACTOR, 0
-
-        # check the list for units
-        idx = -1
-
-        for lst in PREFIXES_DECIMAL:
-            lower_lst = [x.lower() for x in lst]
-            if prefix.lower() in lower_lst:
-                valid_suffix = True
-                idx = lower_lst.index(prefix.lower())
-                used_factor = DECIMAL_FACTOR
-                break
-
-        if idx < 0 or no_suffix_flag:
-            if no_suffix_flag:
-                used_factor = BINARY_FACTOR
-
-            for lst in PREFIXES_BINARY:
-                lower_lst = [x.lower() for x in lst]
-                if prefix.lower() in lower_lst:
-                    valid_suffix = True
-                    idx = lower_lst.index(prefix.lower())
-                    used_factor = BINARY_FACTOR
-                    break
-
-        if idx < 0 or not valid_suffix:
-            raise ValueError("Unable to identify unit '%s'" % raw_units)
-
-        return used_factor, idx + 1
+        """ see parse_units() """
+        return parse_units(raw_units)
 
     def _parse_number(self, raw_number):
         """parse input string containing number
-        return float
+        return int or Decimal so the size computations are exact
         """
-        return float(raw_number)
+        if raw_number.isdigit():
+            return int(raw_number)
+        try:
+            number = Decimal(raw_number)
+        except InvalidOperation:
+            number = None
+        if number is None or not number.is_finite():
+            raise ValueError("The string '%s' is not a valid number" % raw_number)
+        return number
+
+    def _exact_bytes(self, number, multiplier):
+        """multiply the parsed number without rounding it to a float,
+        the fractional part of a byte is truncated
+        """
+        if isinstance(number, int):
+            return number * multiplier
+        try:
+            numerator, denominator = number.as_integer_ratio()
+        except AttributeError:  # Python 2
+            ratio = Fraction(number)
+            numerator, denominator = ratio.numerator, ratio.denominator
+        value = abs(numerator) * multiplier // denominator
+        return value if numerator >= 0 else -value
 
     def _get_unit(self, factor, exponent, unit_type=0):
         """based on decimal or binary factor and exponent
@@ -121,10 +227,17 @@ class Size(object):
             prefix_lst = PREFIXES_BINARY[unit_type]
         return prefix_lst[exponent - 1] + suffix
 
-    @property
-    def bytes(self):
-        """returns size value in bytes as int"""
-        return int((self.factor**self.exponent) * self.number)
+    def to_human(self):
+        """returns size with the highest binary unit, e.g. '10 GiB'"""
+        return self.get(fmt="%d %sb")
+
+    def to_lvm(self):
+        """returns size in the format of the lvm tools, e.g. '10g'"""
+        return self.get(fmt="%d%sb").lower()[:-2]
+
+    def to_parted(self):
+        """returns size in the format of parted, e.g. '10GiB'"""
+        return self.get(fmt="%d%sb")
 
     def _format(self, format_str, factor, exponent):
         result = format_str
@@ -154,14 +267,13 @@ class Size(object):
             ftr = DECIMAL_FACTOR
         if units in ("autobin", "autodec"):
             exp = 0
-            value = float(self.bytes)
-            while value + 0.01 > ftr:  # + 0.01 to balance the float comparison
-                value /= ftr
+            value = self.bytes
+            # switch to the next unit 0.01 before reaching it, i.e. while
+            # value / ftr**exp + 0.01 > ftr, computed on integers
+            while value * 100 + ftr**exp > ftr**(exp + 1) * 100:
                 exp += 1
         else:
             ftr, exp = self._parse_units(units.strip())
-            value = (
-                float(self.factor**self.exponent) / float(ftr**exp)
-            ) * self.number
+            value = self.bytes
 
-        return self._format(fmt, ftr, exp) % value
+        return self._format(fmt, ftr, exp) % (value / ftr**exp)
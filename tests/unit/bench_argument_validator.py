@@ -0,0 +1,168 @@
+"""Compare the old and the hash join check_param_combos on a large spec.
+
+Builds POOLS pools with VOLUMES volumes each, every 10th volume encrypted
+and every 7th with deduplication and compression, and checks the
+unsupported combinations with the cross product search check_param_combos
+used to do and with the current one.
+
+Usage: PYTHONPATH=library:module_utils python tests/unit/bench_argument_validator.py [POOLS [VOLUMES]]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import sys
+import time
+
+from storage_lsr.argument_validator import UNSUPPORTED_COMBOS, check_param_combos, locate_parameter
+
+
+# the search check_param_combos used to do
+
+
+def old_generate_combinations(input_list):
+    # Create list of all valid combinations of parameters
+    # (Note: 'valid' means 'worth exploring')
+
+    # Fill in the stack with the first item to expand
+    stack = [[{'path': input_list[0]['path'],
+               'indices': x,
+               'backtrack_indices': input_list[0]['backtrack_indices']}]
+             for x in input_list[0]['indices']]
+
+    result = []
+
+    while stack:
+        sequence = stack.pop()
+        for item in input_list[len(sequence)]['indices']:
+            new_sequence = sequence + [{'path': input_list[len(sequence)]['path'],
+                                        'indices': item,
+                                        'backtrack_indices': input_list[len(sequence)]['backtrack_indices']}]
+            if len(new_sequence) < len(input_list):
+                stack.append(new_sequence)
+            else:
+                # sequence is complete, now to make sure the combination is valid
+
+                # 'valid' means that all the same path roots have the same indices
+                indices_pairs = {}
+                for rule in new_sequence:
+                    encountered_index = indices_pairs.get(rule['path'][0], -1)
+                    if encountered_index == -1:
+                        # path not yet encountered
+                        indices_pairs[rule['path'][0]] = rule['indices'][0]
+                    elif encountered_index != rule['indices'][0]:
+                        # invalid combination
+                        break
+                else:
+                    # for loop ended without break - combination is valid
+                    result.append(new_sequence)
+
+    return result
+
+
+def old_format_result(combo):
+    rules_list = list()
+    for rule in combo:
+        path_list = rule['path'][0].split('.')
+        indices = rule['backtrack_indices']
+
+        rule_str = ""
+        for i in range(len(path_list)):
+            rule_str += path_list[i]
+            if i < len(indices) and indices[i] is not None:
+                rule_str += '[' + str(indices[i]) + ']'
+            rule_str += '.'
+        rules_list.append(rule_str[:-1])
+    return rules_list
+
+
+def old_check_param_combos(params):
+    all_combos = list()
+
+    for combo in UNSUPPORTED_COMBOS:
+
+        found_combos = list()
+        recorded_matches = list()
+
+        for key, value in combo['options'].items():
+            found = locate_parameter(params, key.split('.'), value)
+            if found is None:
+                # Locate found nothing => the whole combo is clean, no need to continue
+                break
+            else:
+                recorded_matches.append(found)
+        else:
+            # No break happened in loop => need to check result combinations
+
+            for match in recorded_matches:
+                match['backtrack_indices'] = list()
+
+            stack = [recorded_matches]
+
+            while stack:
+                match = stack.pop()
+                combinations = old_generate_combinations(match)
+
+                # It is now possible to dive by shifting the root one level
+                for combination in combinations:
+                    shifted_combo = list()
+                    combo_found = True
+                    for rule in combination:
+                        if len(rule['path']) > 1:
+                            path = rule['path'][1:]
+                            path[0] = rule['path'][0] + '.' + path[0]
+                            indices = [rule['indices'][1:]]
+                            backtrack_indices = rule['backtrack_indices'] + [rule['indices'][0]]
+                            combo_found = False
+                        else:
+                            path = rule['path']
+                            indices = [rule['indices']]
+                            backtrack_indices = rule['backtrack_indices']
+
+                        shifted_combo.append({'path': path,
+                                              'indices': indices,
+                                              'backtrack_indices': backtrack_indices})
+
+                    if combo_found:
+                        # Forbidden combination of parameters confirmed
+                        found_combos.append(old_format_result(combination))
+                    else:
+                        stack.append(shifted_combo)
+        if found_combos != list():
+            all_combos.append({'matches': found_combos, 'msg': combo['err_msg']})
+
+    return all_combos
+
+
+def synthetic_params(pools, volumes):
+    return dict(pools=[dict(name='pool%d' % pool,
+                            volumes=[dict(name='lv%d' % vol,
+                                          encryption=(pool * volumes + vol) % 10 == 0,
+                                          deduplication=(pool * volumes + vol) % 7 == 0,
+                                          compression=(pool * volumes + vol) % 7 == 0,
+                                          thin=False)
+                                     for vol in range(volumes)])
+                       for pool in range(pools)])
+
+
+def main():
+    pools = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    volumes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    params = synthetic_params(pools, volumes)
+
+    start = time.time()
+    expected = old_check_param_combos(params)
+    old = time.time() - start
+
+    start = time.time()
+    found = check_param_combos(params)
+    new = time.time() - start
+
+    assert found == expected, "results differ"
+    print("%d pools x %d volumes, %d unsupported combinations: cross product %.3fs, hash join %.3fs (%.0fx)"
+          % (pools, volumes, sum(len(combo['matches']) for combo in found), old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Compare the per-disk and the in-process sysfs checks of find_unused_disk.
+
+Builds a synthetic /sys/class/block tree and qualifies every disk in it
+once by running readlink for each disk (the way find_unused_disk used to do
+it) and once through get_candidates() and qualify_disks(), the path the
+module runs.
+
+Usage: PYTHONPATH=library:module_utils python tests/unit/bench_find_unused_disk.py [DISKS]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import find_unused_disk
+from test_unused_disk import FakeModule, lsblk_output, make_sysfs
+
+
+def synthetic_disks(count):
+    disks = dict()
+    for idx in range(count):
+        if idx % 2:
+            name = 'nvme%dn1' % idx
+            disks[name] = dict(interface='nvme', partitions=[name + 'p1'] if idx % 3 == 0 else [])
+        else:
+            name = 'sd%s' % idx
+            disks[name] = dict(partitions=[name + '1'] if idx % 3 == 0 else [],
+                               holders=['dm-%d' % idx] if idx % 5 == 0 else [])
+    return disks
+
+
+def per_disk_qualify(disk_paths):
+    qualified = list()
+    for path in disk_paths:
+        sys_name = os.path.basename(path)
+        sys_dir = find_unused_disk.SYS_CLASS_BLOCK + sys_name
+        readlink = subprocess.Popen(['readlink', sys_dir + '/device/device/driver', sys_dir + '/device/driver'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        drivers = readlink.communicate()[0].decode().strip()
+        if 'nvme' in drivers:
+            continue
+        if [f for f in os.listdir(sys_dir) if re.match(sys_name + r'p?\d+$', f)]:
+            continue
+        if os.listdir(sys_dir + '/holders/'):
+            continue
+        qualified.append(path)
+    return qualified
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    root = tempfile.mkdtemp()
+    try:
+        disks = synthetic_disks(count)
+        find_unused_disk.SYS_CLASS_BLOCK = make_sysfs(root, disks)
+        find_unused_disk.can_open = lambda path: True
+        paths = sorted(('/dev/' + name for name in disks), key=os.path.basename)
+        module = FakeModule(lsblk_output(disks))
+
+        start = time.time()
+        expected = per_disk_qualify(paths)
+        per_disk = time.time() - start
+
+        start = time.time()
+        info = list()
+        candidates = find_unused_disk.get_candidates(module, find_unused_disk.get_disks(module, info), info)
+        qualified = [path for path, attrs in find_unused_disk.qualify_disks(module, candidates, info)]
+        in_process = time.time() - start
+    finally:
+        shutil.rmtree(root)
+
+    assert qualified == expected, "qualified disks differ"
+    print("%d disks: per-disk readlink %.3fs, get_candidates/qualify_disks %.3fs (%.1fx)"
+          % (count, per_disk, in_process, per_disk / in_process))
+
+
+if __name__ == '__main__':
+    main()
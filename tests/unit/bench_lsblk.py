@@ -0,0 +1,140 @@
+"""Compare the lsblk output parsers on a synthetic 10k device listing.
+
+Times the per-line shlex parsing blockdev_info used to do, the per-line
+regex find_unused_disk used to do and the shared storage_lsr.lsblk
+parsers for the --pairs and --json output formats. Then times the whole
+of find_unused_disk's get_disks() the old way and the current way, on
+both output formats.
+
+Usage: PYTHONPATH=library:module_utils python tests/unit/bench_lsblk.py [DEVICES]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import re
+import shlex
+import sys
+import timeit
+
+import find_unused_disk
+from storage_lsr.lsblk import parse_json, parse_pairs
+
+
+COLUMNS = ["name", "fstype", "label", "uuid", "type", "size", "mountpoint", "log-sec"]
+DISK_COLUMNS = ["name", "type", "size", "fstype", "log-sec"]
+
+
+def synthetic_devices(count):
+    devices = list()
+    for idx in range(count):
+        kind = ("disk", "part", "lvm", "crypt")[idx % 4]
+        devices.append(dict(name="/dev/%s%d" % (kind, idx), fstype="xfs" if kind != "disk" else None,
+                            label="data %d" % idx if idx % 10 == 0 else None,
+                            uuid="%08x-0000-4000-8000-%012x" % (idx, idx), type=kind, size=10737418240 + idx,
+                            mountpoint="/mnt/%d" % idx if kind == "lvm" else None, **{"log-sec": 512}))
+    return devices
+
+
+def pairs_output(devices, columns=COLUMNS):
+    def value(device, column):
+        return "" if device[column] is None else str(device[column]).replace(" ", "\\x20")
+
+    return "".join(" ".join('%s="%s"' % (column.upper(), value(device, column)) for column in columns) + "\n"
+                   for device in devices)
+
+
+def shlex_parse(buf):
+    devices = list()
+    for line in buf.splitlines():
+        device = dict()
+        for pair in shlex.split(line):
+            key, _eq, value = pair.partition("=")
+            device[key.lower()] = value
+        devices.append(device)
+    return devices
+
+
+LINE = re.compile(r'NAME="(?P<path>[^"]*)" FSTYPE="(?P<fstype>[^"]*)" LABEL="[^"]*" UUID="[^"]*" '
+                  r'TYPE="(?P<type>[^"]*)" SIZE="(?P<size>\d+)" MOUNTPOINT="[^"]*" LOG[_-]SEC="(?P<ssize>\d+)"')
+
+
+def regex_parse(buf):
+    return [LINE.search(line).groupdict() for line in buf.splitlines()]
+
+
+def regex_get_disks(buf, info):
+    # find_unused_disk's get_disks() before it used storage_lsr.lsblk
+    disks = dict()
+    for line in buf.splitlines():
+        info.append("Line: %s" % line)
+        if not line:
+            continue
+
+        m = re.search(r'NAME="(?P<path>[^"]*)" TYPE="(?P<type>[^"]*)" SIZE="(?P<size>\d+)" FSTYPE="(?P<fstype>[^"]*)" '
+                      r'LOG[_-]SEC="(?P<ssize>\d+)"', line)
+        if m is None:
+            info.append("Line did not match: %s" % line)
+            continue
+
+        if m.group('type') != "disk":
+            info.append("Line type [%s] is not disk: %s" % (m.group('type'), line))
+            continue
+
+        disks[m.group('path')] = {"type": m.group('type'), "size": m.group('size'),
+                                  "fstype": m.group('fstype'), "ssize": m.group('ssize')}
+
+    return disks
+
+
+class LsblkModule(object):
+    def __init__(self, buf, json_supported):
+        self.buf = buf
+        self.json_supported = json_supported
+
+    def run_command(self, args):
+        if '--json' in args:
+            return (0, self.buf, '') if self.json_supported else (1, '', 'lsblk: unrecognized option')
+        return 0, self.buf, ''
+
+    def log(self, msg):
+        pass
+
+
+def get_disks(buf, json_supported):
+    # a fresh module run, which does not know yet whether lsblk supports --json
+    sys.modules[find_unused_disk.get_devices.__module__]._lsblk_cache.clear()
+    return find_unused_disk.get_disks(LsblkModule(buf, json_supported), list())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    devices = synthetic_devices(count)
+    pairs = pairs_output(devices)
+    json_buf = json.dumps({"blockdevices": devices})
+
+    assert parse_pairs(pairs) == parse_json(json_buf), "parsers disagree"
+
+    for name, func, buf in (("shlex per line (old blockdev_info)", shlex_parse, pairs),
+                            ("regex per line (old find_unused_disk)", regex_parse, pairs),
+                            ("storage_lsr.lsblk pairs tokenizer", parse_pairs, pairs),
+                            ("storage_lsr.lsblk json", parse_json, json_buf)):
+        best = min(timeit.repeat(lambda: func(buf), number=1, repeat=5))
+        print("%-40s %8.1f ms" % (name, best * 1000))
+
+    disk_pairs = pairs_output(devices, DISK_COLUMNS)
+    disk_json = json.dumps({"blockdevices": [dict((column, device[column]) for column in DISK_COLUMNS)
+                                             for device in devices]})
+    assert regex_get_disks(disk_pairs, list()) == get_disks(disk_pairs, False) == get_disks(disk_json, True)
+
+    for name, func in (("get_disks regex per line (old)", lambda: regex_get_disks(disk_pairs, list())),
+                       ("get_disks lsblk without --json", lambda: get_disks(disk_pairs, False)),
+                       ("get_disks lsblk --json", lambda: get_disks(disk_json, True))):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print("%-40s %8.1f ms" % (name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Compare the Size parser before and after the unit lookup table.
+
+Parses a mix of lsblk byte counts and user supplied sizes with the
+regex / list scanning parser Size used to have and with storage_lsr.size.
+
+Usage: PYTHONPATH=library:module_utils python tests/unit/bench_size.py [SIZES]
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import re
+import sys
+import timeit
+
+from storage_lsr.size import BINARY_FACTOR, DECIMAL_FACTOR, PREFIXES_BINARY, PREFIXES_DECIMAL, SUFFIXES, Size
+
+
+class OldSize(object):
+    """ the parsing part of Size as it used to be """
+
+    def __init__(self, value):
+        m = re.search("^(.*?)([^0-9]*)$", str(value))
+        raw_number = m.group(1).strip()
+        if raw_number == "":
+            raise ValueError("The string '%s' does not contain size" % value)
+        self.factor, self.exponent = self._parse_units(m.group(2).strip())
+        self.number = float(raw_number)
+
+    def _parse_units(self, raw_units):
+        prefix = raw_units
+        no_suffix_flag = True
+        valid_suffix = False
+        used_factor = BINARY_FACTOR
+        for suffix in SUFFIXES:
+            if raw_units.lower().endswith(suffix.lower()):
+                no_suffix_flag = False
+                prefix = raw_units[: -len(suffix)]
+                break
+        if prefix == "":
+            return BINARY_FACTOR, 0
+        idx = -1
+        for lst in PREFIXES_DECIMAL:
+            lower_lst = [x.lower() for x in lst]
+            if prefix.lower() in lower_lst:
+                valid_suffix = True
+                idx = lower_lst.index(prefix.lower())
+                used_factor = DECIMAL_FACTOR
+                break
+        if idx < 0 or no_suffix_flag:
+            if no_suffix_flag:
+                used_factor = BINARY_FACTOR
+            for lst in PREFIXES_BINARY:
+                lower_lst = [x.lower() for x in lst]
+                if prefix.lower() in lower_lst:
+                    valid_suffix = True
+                    idx = lower_lst.index(prefix.lower())
+                    used_factor = BINARY_FACTOR
+                    break
+        if idx < 0 or not valid_suffix:
+            raise ValueError("Unable to identify unit '%s'" % raw_units)
+        return used_factor, idx + 1
+
+    @property
+    def bytes(self):
+        return int((self.factor**self.exponent) * self.number)
+
+
+def synthetic_sizes(count):
+    units = ("", "B", "KiB", "MiB", "GiB", "TiB", "kB", "MB", "GB", "5g", "gibibytes", "megabytes")
+    sizes = list()
+    for idx in range(count):
+        if idx % 2:
+            # lsblk -b byte counts
+            sizes.append(str(10737418240 + idx * 512))
+        else:
+            sizes.append("%d.%d %s" % (idx % 900, idx % 10, units[idx % len(units)]))
+    return sizes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sizes = synthetic_sizes(count)
+
+    for name, cls in (("regex and list scans (old)", OldSize), ("unit table and cache", Size)):
+        best = min(timeit.repeat(lambda: [cls(size).bytes for size in sizes], number=1, repeat=5))
+        print("%-30s %8.1f ms %10.0f sizes/s" % (name, best * 1000, count / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,8 @@ __metaclass__ = type
 
 import pytest
 
-from storage_lsr.size import Size
+import bsize
+from storage_lsr.size import BINARY_FACTOR, DECIMAL_FACTOR, Size, parse_units
 
 
 def test_bsize():
@@ -37,3 +38,53 @@ def test_bsize():
     assert Size("5g").get() == "5.0 GiB"
 
     assert Size("5gb").get() == "4.7 GiB"
+
+
+def test_bsize_exact():
+    # no float rounding in the byte count
+    assert Size("4.35 TB").bytes == 4350000000000
+    assert Size("4.35 EiB").bytes == 435 * 2**60 // 100
+    assert Size("1.5 B").bytes == 1
+    assert Size("10737418240").bytes == 10737418240
+
+    # the exact value is kept for the conversions
+    assert Size("1.5 KiB").get("B", "%0.1f %sb") == "1536.0 B"
+    assert Size("1023.995 KiB").get() == "1.0 MiB"
+
+    with pytest.raises(ValueError) as e:
+        Size("1.2.3 GiB")
+    assert "is not a valid number" in str(e.value)
+
+
+@pytest.mark.parametrize('units, expected', [("", (BINARY_FACTOR, 0)), ("b", (BINARY_FACTOR, 0)),
+                                             ("kB", (DECIMAL_FACTOR, 1)), ("kilobytes", (DECIMAL_FACTOR, 1)),
+                                             ("k", (BINARY_FACTOR, 1)), ("kilo", (BINARY_FACTOR, 1)),
+                                             ("KiB", (BINARY_FACTOR, 1)), ("gibibyte", (BINARY_FACTOR, 3)),
+                                             ("TB", (DECIMAL_FACTOR, 4)), ("yi", (BINARY_FACTOR, 8))])
+def test_parse_units(units, expected):
+    assert parse_units(units) == expected
+
+
+def test_bsize_operators():
+    assert Size("1 KiB") == Size("1024 B")
+    assert Size("1 KiB") != Size("1 kB")
+    assert Size("1 kB") < Size("1 KiB") <= Size(1024)
+    assert Size("2 PiB") > Size("2 PB") >= Size("2000 TB")
+    assert len(set([Size("1 GiB"), Size("1024 MiB"), Size(2**30)])) == 1
+
+    total = Size("1 GiB") + Size("512 MiB")
+    assert total.bytes == 1536 * 2**20
+    assert total.get() == "1.5 GiB"
+    assert (Size("1 GiB") - Size("1.5 GiB")).bytes == -512 * 2**20
+
+    # sizes do not compare to plain numbers
+    assert Size(0) != 0
+    with pytest.raises(TypeError):
+        Size(0) < 1  # pylint: disable=expression-not-assigned
+    with pytest.raises(TypeError):
+        Size(0) + 1  # pylint: disable=expression-not-assigned
+
+
+def test_convert_size():
+    assert bsize.convert_size("10 GiB") == dict(size="10 GiB", bytes=10 * 2**30, lvm="10g", parted="10GiB")
+    assert [bsize.convert_size(size)["bytes"] for size in ("1GB", "100GB")] == [10**9, 10**11]
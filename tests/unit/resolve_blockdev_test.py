@@ -88,3 +88,127 @@ def test_canonical_path(device, monkeypatch):
     canonical = canonical_paths[device]
     if canonical:
         assert resolve_blockdev.canonical_device(device) == canonical
+
+
+BLKID_EXPORT = """DEVNAME=/dev/sdx3
+LABEL=target
+UUID=1111-2222
+TYPE=xfs
+
+DEVNAME=/dev/sdaz
+LABEL=my\\ data
+UUID=6c75fa75-e5ab-4a12-a567-c8aa0b4b60a5
+TYPE=xfs
+
+DEVNAME=/dev/sday
+LABEL=dup
+TYPE=ext4
+
+DEVNAME=/dev/sdaa
+LABEL=dup
+TYPE=ext4
+"""
+
+
+def test_resolve_blockdevs(monkeypatch):
+    commands = list()
+
+    def run_cmd(args):
+        commands.append(args)
+        return (0, BLKID_EXPORT, '')
+
+    listed = list()
+
+    def listdir(path):
+        listed.append(path)
+        return {'/dev': ['sdx3', 'adisk'], '/dev/mapper': ['fakevg-fakelv']}.get(path, [])
+
+    existing = ['/dev/sdx3', '/dev/sdaz', '/dev/adisk', '/dev/mapper/fakevg-fakelv', '/dev/md/unreal']
+    monkeypatch.setattr(resolve_blockdev, '_search_cache', dict(dirs=['/dev', '/dev/mapper', '/dev/md']))
+    monkeypatch.setattr(os, 'listdir', listdir)
+    monkeypatch.setattr(os.path, 'exists', lambda p: p in existing)
+
+    specs = ['LABEL=target', 'UUID=6c75fa75-e5ab-4a12-a567-c8aa0b4b60a5', 'LABEL="my data"', 'LABEL=dup',
+             'LABEL=missing', 'adisk', 'fakevg-fakelv', 'mapper/fakevg-fakelv', 'unreal', 'nothere',
+             '/dev/adisk', '/dev/nothere', 'adisk']
+    devices = resolve_blockdev.resolve_blockdevs(specs, run_cmd)
+
+    assert devices == {'LABEL=target': '/dev/sdx3',
+                       'UUID=6c75fa75-e5ab-4a12-a567-c8aa0b4b60a5': '/dev/sdaz',
+                       'LABEL="my data"': '/dev/sdaz',
+                       'LABEL=dup': '',
+                       'LABEL=missing': '',
+                       'adisk': '/dev/adisk',
+                       'fakevg-fakelv': '/dev/mapper/fakevg-fakelv',
+                       'mapper/fakevg-fakelv': '/dev/mapper/fakevg-fakelv',
+                       'unreal': '/dev/md/unreal',
+                       'nothere': '',
+                       '/dev/adisk': '/dev/adisk',
+                       '/dev/nothere': ''}
+    assert commands == ['blkid -o export']
+    assert listed == ['/dev', '/dev/mapper', '/dev/md']
+
+
+class FakeStat(object):
+    def __init__(self, rdev):
+        self.st_rdev = rdev
+
+
+def test_canonical_device_maps(tmp_path, monkeypatch):
+    sys_block = tmp_path / 'block'
+    for kname, dm_name in (('dm-0', 'vg_system-lv_root'), ('dm-3', 'vg_system-lv_data'), ('sda', None)):
+        (sys_block / kname / 'dm').mkdir(parents=True)
+        if dm_name:
+            (sys_block / kname / 'dm' / 'name').write_text(dm_name + u'\n')
+
+    rdevs = {'/dev/md/userdb': os.makedev(9, 127), '/dev/md/userdb1': os.makedev(259, 1),
+             '/dev/md/home': os.makedev(9, 126), '/dev/md127': os.makedev(9, 127),
+             '/dev/md127p1': os.makedev(259, 1), '/dev/md1': os.makedev(9, 1)}
+    stats = list()
+
+    def stat(path):
+        stats.append(path)
+        return FakeStat(rdevs[path])
+
+    monkeypatch.setattr(resolve_blockdev, 'SYS_CLASS_BLOCK', str(sys_block))
+    monkeypatch.setattr(resolve_blockdev, '_name_maps', dict())
+    monkeypatch.setattr(os.path, 'isdir', lambda path: path == '/dev/md')
+    monkeypatch.setattr(os, 'stat', stat)
+    real_listdir = os.listdir
+    monkeypatch.setattr(os, 'listdir',
+                        lambda path: ['userdb', 'userdb1', 'home'] if path == '/dev/md' else real_listdir(path))
+
+    assert resolve_blockdev.canonical_device('/dev/dm-3') == '/dev/mapper/vg_system-lv_data'
+    assert resolve_blockdev.canonical_device('/dev/dm-0') == '/dev/mapper/vg_system-lv_root'
+    assert resolve_blockdev.canonical_device('/dev/md127') == '/dev/md/userdb'
+    assert resolve_blockdev.canonical_device('/dev/md127p1') == '/dev/md/userdb1'
+    with pytest.raises(KeyError):
+        resolve_blockdev.canonical_device('/dev/dm-7')
+    with pytest.raises(KeyError):
+        resolve_blockdev.canonical_device('/dev/md1')
+
+    # /dev/md is only scanned once, lookups just stat the kernel device
+    assert stats.count('/dev/md/userdb') == 1
+
+
+def test_search_dirs_lazy(monkeypatch):
+    globbed = list()
+    probed = list()
+    listing = {'/dev': ['sda', 'mapper'], '/dev/mapper': ['vg-lv'], '/dev/disk/by-id': ['wwn-0x123456789abc', 'vg-lv']}
+
+    monkeypatch.setattr(resolve_blockdev, '_search_cache', dict())
+    monkeypatch.setattr(resolve_blockdev.glob, 'glob', lambda pattern: globbed.append(pattern) or ['/dev/disk/by-id'])
+    monkeypatch.setattr(os, 'listdir', lambda path: listing.get(path, []))
+    existing = ['/dev/mapper/vg-lv', '/dev/disk/by-id/wwn-0x123456789abc']
+    monkeypatch.setattr(os.path, 'exists', lambda path: probed.append(path) or path in existing)
+    monkeypatch.setattr(os.path, 'realpath', lambda path: path)
+
+    assert resolve_blockdev.resolve_blockdev('/dev/mapper/vg-lv', None) == '/dev/mapper/vg-lv'
+    assert globbed == []
+
+    del probed[:]
+    assert resolve_blockdev.resolve_blockdev('wwn-0x123456789abc', None) == '/dev/disk/by-id/wwn-0x123456789abc'
+    assert resolve_blockdev.resolve_blockdev('vg-lv', None) == '/dev/mapper/vg-lv'
+    assert globbed == ['/dev/disk/by-*']
+    # found through the index, without probing the other search dirs
+    assert probed == ['/dev/disk/by-id/wwn-0x123456789abc'] * 2 + ['/dev/mapper/vg-lv'] * 2
@@ -0,0 +1,53 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from storage_lsr.argument_validator import check_param_combos, join_matches, locate_parameter
+
+
+def _volume(**kwargs):
+    volume = dict(encryption=False, deduplication=None, compression=None, thin=None)
+    volume.update(kwargs)
+    return volume
+
+
+def test_check_param_combos():
+    params = dict(pools=[dict(volumes=[_volume(encryption=True), _volume(deduplication=True)]),
+                         dict(volumes=[_volume(encryption=True, deduplication=True),
+                                       _volume(encryption='yes', deduplication=True, compression=True),
+                                       _volume(thin=True, compression=True)])])
+
+    assert check_param_combos(params) == [
+        {'matches': [['pools[1].volumes[1].encryption', 'pools[1].volumes[1].deduplication'],
+                     ['pools[1].volumes[0].encryption', 'pools[1].volumes[0].deduplication']],
+         'msg': "Deduplication is not supported on encrypted volumes"},
+        {'matches': [['pools[1].volumes[1].encryption', 'pools[1].volumes[1].compression']],
+         'msg': "Compression is not supported on encrypted volumes"},
+        {'matches': [['pools[1].volumes[2].thin', 'pools[1].volumes[2].compression']],
+         'msg': "Dedupliation is not supported on thin pool volumes"}]
+
+    # the same options in different volumes or pools are fine
+    pools = [dict(volumes=[_volume(encryption=True), _volume(thin=True)]),
+             dict(volumes=[_volume(deduplication=True), _volume(compression=True)])]
+    assert check_param_combos(dict(pools=pools)) == []
+    assert check_param_combos(dict(pools=[])) == []
+
+
+def test_join_matches():
+    params = dict(pools=[dict(encryption=True, volumes=[_volume(thin=True), _volume(thin=True)]),
+                         dict(encryption=False, volumes=[_volume(thin=True)]),
+                         dict(encryption=True, volumes=[_volume()])])
+    matches = [locate_parameter(params, ['pools', 'encryption'], [True]),
+               locate_parameter(params, ['pools', 'volumes', 'thin'], [True])]
+
+    assert join_matches(matches) == [[[0, None], [0, 0, None]], [[0, None], [0, 1, None]]]
+
+
+def test_check_param_combos_many():
+    volumes = [_volume(encryption=idx % 2 == 0, deduplication=idx % 3 == 0) for idx in range(50)]
+    params = dict(pools=[dict(volumes=volumes) for dummy in range(200)])
+
+    matches = check_param_combos(params)[0]['matches']
+    assert len(matches) == 200 * 9
+    assert matches[0] == ['pools[199].volumes[48].encryption', 'pools[199].volumes[48].deduplication']
+    assert matches[-1] == ['pools[0].volumes[0].encryption', 'pools[0].volumes[0].deduplication']
@@ -0,0 +1,841 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+import logging
+import re
+import threading
+
+import pytest
+
+import blivet
+
+
+LSBLK_OUTPUT = (
+    'NAME="/dev/sda" KNAME="/dev/sda" PKNAME="" TYPE="disk" SIZE="10737418240"'
+    ' FSTYPE="" LABEL="" UUID="" PARTLABEL="" PARTUUID="" MOUNTPOINT=""\n'
+    'NAME="/dev/sda1" KNAME="/dev/sda1" PKNAME="/dev/sda" TYPE="part" SIZE="10736369664"'
+    ' FSTYPE="xfs" LABEL="" UUID="root-uuid" PARTLABEL="root" PARTUUID="root-partuuid" MOUNTPOINT="/"\n'
+    'NAME="/dev/sdb" KNAME="/dev/sdb" PKNAME="" TYPE="disk" SIZE="10737418240"'
+    ' FSTYPE="LVM2_member" LABEL="" UUID="pv1" PARTLABEL="" PARTUUID="" MOUNTPOINT=""\n'
+    'NAME="/dev/mapper/foo-test1" KNAME="/dev/dm-0" PKNAME="/dev/sdb" TYPE="lvm" SIZE="3221225472"'
+    ' FSTYPE="xfs" LABEL="" UUID="test1-uuid" PARTLABEL="" PARTUUID="" MOUNTPOINT="/opt/test1"\n'
+    'NAME="/dev/mapper/foo-swap" KNAME="/dev/dm-1" PKNAME="/dev/sdb" TYPE="lvm" SIZE="1073741824"'
+    ' FSTYPE="swap" LABEL="" UUID="swap-uuid" PARTLABEL="" PARTUUID="" MOUNTPOINT="[SWAP]"\n'
+    'NAME="/dev/sdc" KNAME="/dev/sdc" PKNAME="" TYPE="disk" SIZE="10737418240"'
+    ' FSTYPE="LVM2_member" LABEL="" UUID="pv2" PARTLABEL="" PARTUUID="" MOUNTPOINT=""\n'
+    'NAME="/dev/mapper/foo-test1" KNAME="/dev/dm-0" PKNAME="/dev/sdc" TYPE="lvm" SIZE="3221225472"'
+    ' FSTYPE="xfs" LABEL="" UUID="test1-uuid" PARTLABEL="" PARTUUID="" MOUNTPOINT="/opt/test1"\n'
+    'NAME="/dev/sdd" KNAME="/dev/sdd" PKNAME="" TYPE="disk" SIZE="10737418240"'
+    ' FSTYPE="ext4" LABEL="data" UUID="disk-uuid" PARTLABEL="" PARTUUID="" MOUNTPOINT="/data"\n'
+)
+
+PVS_OUTPUT = """  LVM2_PV_NAME='/dev/sdb' LVM2_VG_NAME='foo'
+  LVM2_PV_NAME='/dev/sdc' LVM2_VG_NAME='foo'
+"""
+
+LVS_OUTPUT = """  LVM2_VG_NAME='foo' LVM2_LV_NAME='test1' LVM2_LV_ATTR='-wi-ao----' LVM2_SEGTYPE='linear'
+  LVM2_VG_NAME='foo' LVM2_LV_NAME='swap' LVM2_LV_ATTR='-wi-ao----' LVM2_SEGTYPE='linear'
+"""
+
+VOLUME_DEFAULTS = dict(state='present', type='lvm', size=0, disks=[], fs_type='xfs', fs_label='',
+                       fs_create_options='', mount_point='', mount_options='defaults', mount_check=0,
+                       mount_passno=0, mount_user=None, mount_group=None, mount_mode=None,
+                       encryption=False, encryption_password=None, raid_level=None, compression=None,
+                       deduplication=None, vdo_pool_size=None, thin=None, cached=False)
+
+POOL_DEFAULTS = dict(state='present', type='lvm', disks=[], volumes=[], grow_to_fill=False,
+                     encryption=False, encryption_password=None, raid_level=None, shared=False)
+
+
+def _volume(**kwargs):
+    volume = dict(name=None, type=None, state='present', size=None, fs_type=None, fs_label=None,
+                  mount_point=None, encryption=None, raid_level=None, disks=[])
+    volume.update(kwargs)
+    return volume
+
+
+def _pool(**kwargs):
+    pool = dict(name='foo', type=None, state='present', disks=['sdb', 'sdc'], encryption=None,
+                raid_level=None, grow_to_fill=None,
+                volumes=[_volume(name='test1', size='3 GiB', mount_point='/opt/test1'),
+                         _volume(name='swap', fs_type='swap')])
+    pool.update(kwargs)
+    return pool
+
+
+class FakeModule(object):
+    def __init__(self, pools=None, volumes=None, lsblk_output=LSBLK_OUTPUT):
+        self.params = dict(pools=pools or [], volumes=volumes or [])
+        self.lsblk_output = lsblk_output
+
+    def get_bin_path(self, name):
+        return '/usr/sbin/' + name
+
+    def run_command(self, args):
+        if 'pvs' in args:
+            return 0, PVS_OUTPUT, ''
+        elif 'lvs' in args:
+            return 0, LVS_OUTPUT, ''
+        return 0, self.lsblk_output, ''
+
+
+@pytest.fixture(autouse=True)
+def blivet_globals(monkeypatch, tmp_path):
+    monkeypatch.setattr(blivet, 'log', logging.getLogger('test'), raising=False)
+    monkeypatch.setattr(blivet, 'volume_defaults', copy.deepcopy(VOLUME_DEFAULTS))
+    monkeypatch.setattr(blivet, 'pool_defaults', copy.deepcopy(POOL_DEFAULTS))
+    monkeypatch.setattr(blivet, '_spec_size', lambda spec: {'3 GiB': 3 * 1024**3, '4 GiB': 4 * 1024**3}[spec])
+    monkeypatch.setattr(blivet.os.path, 'exists', lambda path: False)
+
+
+def _check(pools=None, volumes=None, lsblk_output=LSBLK_OUTPUT):
+    module = FakeModule(pools, volumes, lsblk_output)
+    return blivet.check_noop(module, blivet.get_device_report(module))
+
+
+def test_device_report():
+    report = blivet.get_device_report(FakeModule())
+    assert report.lookup('sdb')['kname'] == '/dev/sdb'
+    assert report.lookup('UUID=test1-uuid')['name'] == '/dev/mapper/foo-test1'
+    assert report.lookup('LABEL=data')['name'] == '/dev/sdd'
+    assert report.lookup('PARTUUID=root-partuuid')['name'] == '/dev/sda1'
+    assert report.lookup('PARTLABEL="root"')['name'] == '/dev/sda1'
+    assert report.lookup('PARTLABEL=data') is None
+    assert report.lookup('PARTUUID=') is None
+    assert report.lookup('/dev/dm-0')['name'] == '/dev/mapper/foo-test1'
+    assert report.lookup('sdx') is None
+    assert report.disks('/dev/dm-0') == ['sdb', 'sdc']
+    assert report.pvs == {'foo': ['/dev/sdb', '/dev/sdc']}
+
+
+def test_noop_pool():
+    result = _check(pools=[_pool()])
+    assert result is not None
+    assert result['changed'] is False
+    assert result['actions'] == []
+    assert result['crypts'] == []
+
+    pool = result['pools'][0]
+    assert pool['type'] == 'lvm'
+    assert pool['encryption'] is False
+
+    test1, swap = pool['volumes']
+    assert test1['fs_type'] == 'xfs'
+    assert test1['disks'] == ['sdb', 'sdc']
+    assert test1['_device'] == '/dev/mapper/foo-test1'
+    assert test1['_mount_id'] == 'UUID=test1-uuid'
+    assert test1['_kernel_device'] == '/dev/dm-0'
+    assert swap['size'] == 1024**3
+    assert swap['mount_point'] is None
+
+    assert [m['path'] for m in result['mounts']] == ['/opt/test1', 'none']
+    assert result['mounts'][0]['src'] == 'UUID=test1-uuid'
+    assert result['mounts'][0]['state'] == 'mounted'
+
+
+def test_noop_disk_volume():
+    volume = _volume(name='data', type='disk', disks=['sdd'], fs_type='ext4', mount_point='/data')
+    result = _check(volumes=[volume])
+    assert result is not None
+    assert result['volumes'][0]['fs_label'] == 'data'
+    assert result['volumes'][0]['_mount_id'] == 'UUID=disk-uuid'
+
+
+@pytest.mark.parametrize('pool', [
+    _pool(disks=['sdb']),
+    _pool(disks=['sdb', 'sdc', 'sdd']),
+    _pool(name='bar'),
+    _pool(encryption=True),
+    _pool(raid_level='raid1'),
+    _pool(state='absent'),
+    _pool(volumes=[_volume(name='test1', size='4 GiB', mount_point='/opt/test1')]),
+    _pool(volumes=[_volume(name='test1', fs_type='ext4', mount_point='/opt/test1')]),
+    _pool(volumes=[_volume(name='test1', fs_label='new', mount_point='/opt/test1')]),
+    _pool(volumes=[_volume(name='test1', size='50%', mount_point='/opt/test1')]),
+    _pool(volumes=[_volume(name='test1')]),
+    _pool(volumes=[_volume(name='test2', mount_point='/opt/test2')]),
+    _pool(volumes=[_volume(name='swap', mount_point='/swap')]),
+    _pool(volumes=[_volume(name='test1', mount_point='/opt/test1', state='absent')]),
+    _pool(volumes=[_volume(name='test1', mount_point='/opt/test1', encryption=True)]),
+])
+def test_noop_pool_mismatch(pool):
+    original = copy.deepcopy(pool)
+    assert _check(pools=[pool]) is None
+    assert pool == original
+
+
+@pytest.mark.parametrize('volume', [
+    _volume(name='data', type='disk', disks=['sda'], mount_point='/data'),
+    _volume(name='data', type='disk', disks=['sdd'], fs_type='xfs', mount_point='/data'),
+    _volume(name='data', type='disk', disks=['sdd'], size='3 GiB', mount_point='/data'),
+    _volume(name='data', type='lvm', disks=['sdd'], mount_point='/data'),
+])
+def test_noop_disk_volume_mismatch(volume):
+    assert _check(volumes=[volume]) is None
+
+
+@pytest.mark.parametrize('fstype', ['crypto_LUKS', 'LVM2_member', 'linux_raid_member'])
+def test_noop_not_a_file_system(fstype):
+    # the full code path reads e.g. the encryption from these formats
+    lsblk_output = LSBLK_OUTPUT.replace('FSTYPE="ext4"', 'FSTYPE="%s"' % fstype)
+    lsblk_output = lsblk_output.replace('FSTYPE="xfs" LABEL="" UUID="test1-uuid"',
+                                        'FSTYPE="%s" LABEL="" UUID="test1-uuid"' % fstype)
+    assert _check(volumes=[_volume(name='data', type='disk', disks=['sdd'], mount_point='/data')]) is not None
+    assert _check(volumes=[_volume(name='data', type='disk', disks=['sdd'], mount_point='/data')],
+                  lsblk_output=lsblk_output) is None
+    assert _check(pools=[_pool()]) is not None
+    assert _check(pools=[_pool()], lsblk_output=lsblk_output) is None
+
+
+def test_noop_duplicate_names():
+    assert _check(pools=[_pool(), _pool()]) is None
+
+
+def test_find_duplicate_names():
+    assert blivet.find_duplicate_names([]) == []
+    names = ['a', 'b', 'c', 'b', 'a', 'b', 'd', 'a', 'c']
+    assert blivet.find_duplicate_names([dict(name=n) for n in names]) == ['b', 'a', 'c']
+
+
+def test_find_duplicate_names_many():
+    volumes = [dict(name='lv%05d' % idx) for idx in range(10000)]
+    assert blivet.find_duplicate_names(volumes) == []
+
+    volumes += [dict(name='lv%05d' % idx) for idx in range(9999, -1, -2)] * 2
+    assert blivet.find_duplicate_names(volumes) == ['lv%05d' % idx for idx in range(9999, -1, -2)]
+
+
+def test_profiler():
+    profiler = blivet.Profiler()
+    with profiler.measure('reset'):
+        pass
+    assert profiler.timings == {}
+
+    profiler.enabled = True
+    for dummy in range(3):
+        with profiler.measure('do_partitioning'):
+            pass
+    with profiler.measure_item(pool='foo'):
+        with profiler.measure_item(pool='foo', volume='test1'):
+            pass
+    with profiler.measure_item(volume='wall'):
+        pass
+
+    assert profiler.timings['do_partitioning']['calls'] == 3
+    assert set(profiler.timings['do_partitioning']) == set(['wall', 'cpu', 'calls'])
+    pool = profiler.timings['pools']['foo']
+    assert pool['calls'] == 1
+    assert pool['volumes']['test1']['calls'] == 1
+    assert pool['wall'] >= pool['volumes']['test1']['wall']
+    assert set(profiler.timings['volumes']['wall']) == set(['wall', 'cpu', 'calls'])
+    assert set(profiler.timings) == set(['do_partitioning', 'pools', 'volumes'])
+
+
+class FakePartitionVolume(object):
+    def __init__(self, events, volume):
+        self._events = events
+        self._volume = volume
+        self._device = 'existing' if volume.get('exists') else None
+
+    @property
+    def _creates_partition(self):
+        return self._device is None
+
+    def _locked_luks_device(self):
+        return None
+
+    def _look_up_device(self):
+        self._events.append(('look_up', self._volume['name']))
+
+    def _manage_device(self):
+        self._events.append(('device', self._volume['name']))
+        if self._device is None:
+            self._device = 'new'
+
+    def _manage_stack(self):
+        self._events.append(('stack', self._volume['name']))
+
+
+def test_partition_volumes_allocated_together(monkeypatch):
+    events = list()
+    monkeypatch.setattr(blivet, '_get_blivet_volume', lambda b, volume, bpool: FakePartitionVolume(events, volume))
+    monkeypatch.setattr(blivet, 'do_partitioning', lambda b: events.append(('allocate',)), raising=False)
+
+    pool = dict(name='sdb', volumes=[dict(name='sdb1'), dict(name='sdb2'), dict(name='sdb3', exists=True),
+                                     dict(name='sdb4'), dict(name='sdb5')])
+    blivet.BlivetPartitionPool(None, pool)._manage_volumes()
+
+    assert events.count(('allocate',)) == 2
+    assert [e for e in events if e[0] != 'look_up'] == [('device', 'sdb1'), ('device', 'sdb2'),
+                                                        ('allocate',), ('stack', 'sdb1'), ('stack', 'sdb2'),
+                                                        ('device', 'sdb3'), ('stack', 'sdb3'),
+                                                        ('device', 'sdb4'), ('device', 'sdb5'),
+                                                        ('allocate',), ('stack', 'sdb4'), ('stack', 'sdb5')]
+
+
+def test_volume_looked_up_once(monkeypatch):
+    resolved = list()
+    monkeypatch.setattr(blivet, 'resolve_device', lambda b, spec: resolved.append(spec))
+    bvolume = blivet.BlivetVolume(None, _volume(name='data'))
+
+    # looked up by the pool first and then again by _manage_device()
+    bvolume._look_up_device()
+    bvolume._look_up_device()
+
+    assert resolved == ['data']
+    assert bvolume._device is None
+
+
+FSTAB = """# /etc/fstab
+UUID=root-uuid  /  xfs  defaults  0 0
+/dev/mapper/foo-test1  /opt/test1  xfs  defaults  0 0
+server:/export  /mnt/nfs  nfs  defaults  0 0
+//server/share  /mnt/cifs  cifs  defaults  0 0
+/srv/data  /mnt/bind  none  bind  0 0
+UUID=root-uuid  /mnt/again  xfs  defaults  0 0
+tmpfs  /tmp  tmpfs  defaults  0 0
+"""
+
+
+def test_fstab_index(monkeypatch, tmp_path):
+    fstab_file = tmp_path / 'fstab'
+    fstab_file.write_text(FSTAB)
+    real_open = open
+    monkeypatch.setattr(blivet.os.path, 'exists', lambda path: True)
+    monkeypatch.setattr(blivet, 'open', lambda path: real_open(str(fstab_file)), raising=False)
+
+    resolved = list()
+
+    class RecordingFSTab(blivet.FSTab):
+        def _resolve_path(self, spec):
+            resolved.append(spec)
+            return {'UUID=root-uuid': '/dev/sda1', '/dev/mapper/foo-test1': '/dev/mapper/foo-test1'}.get(spec)
+
+    fstab = RecordingFSTab(None)
+
+    assert resolved == ['UUID=root-uuid', '/dev/mapper/foo-test1', 'tmpfs']
+    assert fstab.lookup('device_path', '/dev/sda1')['mount_point'] == '/'
+    assert fstab.lookup('device_id', 'UUID=root-uuid')['mount_point'] == '/'
+    assert fstab.lookup('mount_point', '/mnt/again')['device_path'] == '/dev/sda1'
+    assert fstab.lookup('mount_point', '/mnt/nfs')['device_path'] is None
+    assert fstab.lookup('fs_type', 'cifs')['mount_point'] == '/mnt/cifs'
+    assert fstab.lookup('device_path', '/dev/sdx') is None
+
+
+class FakeTreeDevice(object):
+    def __init__(self, name, path=None, uuid=None, label=None, complete=True):
+        self.name = name
+        self.path = path or '/dev/' + name
+        self.uuid = uuid
+        self.label = label
+        self.complete = complete
+
+
+class FakeLV(FakeTreeDevice):
+    pass
+
+
+class FakeVG(FakeTreeDevice):
+    pass
+
+
+class FakeTree(object):
+    def __init__(self, devices):
+        self._devices = devices
+        self.fallback = list()
+
+    @property
+    def uuids(self):
+        return dict((d.uuid, d) for d in self._devices if d.uuid)
+
+    @property
+    def labels(self):
+        return dict((d.label, d) for d in self._devices if d.label)
+
+    def resolve_device(self, spec):
+        self.fallback.append(spec)
+        return 'fallback'
+
+
+class FakeCallbackList(object):
+    def __init__(self):
+        self.callbacks = list()
+
+    def add(self, callback):
+        self.callbacks.append(callback)
+
+    def __call__(self, **kwargs):
+        for callback in self.callbacks:
+            callback(**kwargs)
+
+
+@pytest.fixture
+def index_env(monkeypatch):
+    fake_callbacks = type('FakeCallbacks', (object,), {})()
+    for name in blivet.DeviceIndex.CALLBACKS:
+        setattr(fake_callbacks, name, FakeCallbackList())
+    monkeypatch.setattr(blivet, 'callbacks', fake_callbacks, raising=False)
+    fake_devices = type('FakeDevices', (object,), dict(LVMLogicalVolumeDevice=FakeLV, LVMVolumeGroupDevice=FakeVG))
+    monkeypatch.setattr(blivet, 'devices', fake_devices)
+    return fake_callbacks
+
+
+def test_device_index(index_env, monkeypatch):
+    sda = FakeTreeDevice('sda')
+    sda1 = FakeTreeDevice('sda1', uuid='part-uuid', label='data')
+    vg = FakeVG('foo', path='/dev/foo')
+    lv = FakeLV('foo-my-lv', path='/dev/mapper/foo-my--lv', uuid='lv-uuid')
+    dup = FakeTreeDevice('sda1-dup', path='/dev/sda1')
+    incomplete = FakeTreeDevice('sdb', complete=False)
+    tree = FakeTree([sda, sda1, vg, lv, dup, incomplete])
+    monkeypatch.setattr(blivet.os.path, 'realpath', lambda path: {'/dev/disk/by-id/wwn-1': '/dev/sda'}.get(path, path))
+
+    index = blivet.DeviceIndex()
+    # not watching for changes, nothing is indexed
+    assert index.resolve(tree, 'sda') == 'fallback'
+    index.watch()
+
+    assert index.resolve(tree, 'sda') is sda
+    assert index.resolve(tree, '/dev/sda') is sda
+    assert index.resolve(tree, '/dev/disk/by-id/wwn-1') is sda
+    # paths prefer the last device, like resolve_device()
+    assert index.resolve(tree, '/dev/sda1') is dup
+    assert index.resolve(tree, 'sda1') is sda1
+    assert index.resolve(tree, 'UUID=part-uuid') is sda1
+    assert index.resolve(tree, 'PARTUUID="part-uuid"') is sda1
+    assert index.resolve(tree, "LABEL='data'") is sda1
+    assert index.resolve(tree, 'foo-my--lv') is lv
+    assert index.resolve(tree, '/dev/mapper/foo-my--lv') is lv
+    assert index.resolve(tree, '/dev/foo/my-lv') is lv
+    assert index.resolve(tree, 'foo') is vg
+    assert index.resolve(tree, 'sdb') is None
+    assert index.resolve(tree, 'UUID=nope') is None
+
+    tree.fallback = list()
+    assert index.resolve(tree, '0x80') == 'fallback'
+    assert index.resolve(tree, '/dev/dm-0') == 'fallback'
+    assert index.resolve(tree, '/dev/md127') == 'fallback'
+    assert index.resolve(tree, '0x80') == 'fallback'
+    assert tree.fallback == ['0x80', '/dev/dm-0', '/dev/md127']
+
+
+def test_device_index_invalidate(index_env):
+    sda = FakeTreeDevice('sda')
+    tree = FakeTree([sda])
+    index = blivet.DeviceIndex()
+    index.watch()
+
+    assert index.resolve(tree, 'sdb') is None
+    sdb = FakeTreeDevice('sdb')
+    tree._devices.append(sdb)
+    # still the cached result until the tree reports a change
+    assert index.resolve(tree, 'sdb') is None
+    index_env.device_added(device=sdb)
+    assert index.resolve(tree, 'sdb') is sdb
+
+    sda.name = 'sda-renamed'
+    assert index.resolve(tree, 'sda-renamed') is None
+    index.invalidate()
+    assert index.resolve(tree, 'sda-renamed') is sda
+
+    # a different tree is indexed on its own
+    other = FakeTree([FakeTreeDevice('sda')])
+    assert index.resolve(other, 'sda') is other._devices[0]
+
+
+class FakeLVInfo(object):
+    def __init__(self, lv_name, segtype, size=1024, uuid=None):
+        self.lv_name = lv_name
+        self.segtype = segtype
+        self.size = size
+        self.uuid = uuid or lv_name + '-uuid'
+
+
+class FakeInternalLVtype(object):
+    cache_pool = 'cache_pool'
+    origin = 'origin'
+    image = 'image'
+
+
+class FakeCacheLV(object):
+    def __init__(self, name, vg=None, parent_lv=None, int_lv_type=None, seg_type=None, **kwargs):
+        self.lvname = name
+        self.vg = vg
+        self.seg_type = seg_type
+        self.int_lv_type = int_lv_type
+        self.kwargs = kwargs
+        self._internal_lvs = list()
+        self._cache = 'cache' if seg_type == 'cache' else None
+        self._parent_lv = None
+        self.parent_lv = parent_lv
+
+    @property
+    def raw_device(self):
+        return self
+
+    @property
+    def parent_lv(self):
+        return self._parent_lv
+
+    @parent_lv.setter
+    def parent_lv(self, parent_lv):
+        if self._parent_lv:
+            self._parent_lv.remove_internal_lv(self)
+        self._parent_lv = parent_lv
+        if parent_lv:
+            parent_lv._internal_lvs.append(self)
+
+    def remove_internal_lv(self, int_lv):
+        self._internal_lvs.remove(int_lv)
+
+
+class FakeLVMBlivet(object):
+    def __init__(self):
+        self.devicetree = self
+        self.added = list()
+        self.destroyed = list()
+        self.resets = 0
+
+    def _add_device(self, device):
+        self.added.append(device)
+
+    def destroy_device(self, device):
+        self.destroyed.append(device)
+
+    def reset(self):
+        self.resets += 1
+
+
+@pytest.fixture
+def detach_env(monkeypatch):
+    vg = FakeTreeDevice('foo')
+    lv = FakeCacheLV('test1', vg=vg, seg_type='cache')
+    cpool = FakeCacheLV('[cache]', parent_lv=lv, int_lv_type='cache_pool', seg_type='cache-pool')
+    cdata = FakeCacheLV('[cache_cdata]', parent_lv=cpool, int_lv_type='data')
+    origin = FakeCacheLV('[test1_corig]', parent_lv=lv, int_lv_type='origin', seg_type='raid1')
+    images = [FakeCacheLV('[test1_corig_rimage_%d]' % idx, parent_lv=origin, int_lv_type='image') for idx in range(2)]
+    lv.cache = type('FakeCache', (object,), dict(detach=lambda self: 'cache'))()
+
+    lvs_calls = list()
+    env = dict(vg=vg, lv=lv, cdata=cdata, images=images, lvs_calls=lvs_calls, dropped=list(),
+               lvs=[FakeLVInfo('test1', 'raid1'), FakeLVInfo('cache', 'cache-pool'), FakeLVInfo('other', 'linear')])
+
+    def lvs(vg_name):
+        lvs_calls.append(vg_name)
+        return env['lvs']
+
+    lvm = type('FakeLVMLib', (object,), {})()
+    lvm.blockdev = type('FakeBlockDev', (object,), {})()
+    lvm.blockdev.lvm = type('FakeBlockDevLVM', (object,), dict(lvs=staticmethod(lvs)))()
+    lvm.lvs_info = type('FakeLVsInfo', (object,), dict(drop_cache=lambda self: env['dropped'].append(True)))()
+    monkeypatch.setattr(blivet, 'devicelibs', type('FakeDevicelibs', (object,), dict(lvm=lvm)), raising=False)
+
+    def new_lv(name, parents, **kwargs):
+        return FakeCacheLV(name, vg=parents[0], seg_type=kwargs.pop('seg_type'), **kwargs)
+
+    fake_devices = type('FakeDevices', (object,), dict(LVMLogicalVolumeDevice=staticmethod(new_lv)))
+    fake_devices.lvm = type('FakeLVMDevices', (object,), dict(LVMInternalLVtype=FakeInternalLVtype))
+    monkeypatch.setattr(blivet, 'devices', fake_devices)
+    monkeypatch.setattr(blivet, 'Size', int, raising=False)
+    monkeypatch.setattr(blivet, 'resolve_device', lambda b, spec: 'resolved %s' % spec)
+    return env
+
+
+def test_detach_cache_scoped_refresh(detach_env):
+    b = FakeLVMBlivet()
+    volume = blivet.BlivetLVMVolume(b, _volume(name='test1'))
+    lv = detach_env['lv']
+    volume._device = lv
+
+    volume._detach_cache()
+
+    assert b.resets == 0
+    assert detach_env['lvs_calls'] == ['foo']
+    assert detach_env['dropped'] == [True]
+    cpool = b.added[0]
+    assert b.added == [cpool]
+    assert b.destroyed == [cpool]
+    assert (cpool.lvname, cpool.vg, cpool.seg_type) == ('cache', detach_env['vg'], 'cache-pool')
+    assert cpool.kwargs == dict(uuid='cache-uuid', size=1024, exists=True)
+    assert cpool._internal_lvs == [detach_env['cdata']]
+    # the LV is no longer cached and owns the RAID images of the former origin
+    assert lv._cache is None
+    assert lv.seg_type == 'raid1'
+    assert lv._internal_lvs == detach_env['images']
+
+
+def test_detach_cache_full_reset_fallback(detach_env):
+    b = FakeLVMBlivet()
+    volume = blivet.BlivetLVMVolume(b, _volume(name='test1'))
+    volume._device = detach_env['lv']
+    detach_env['lvs'] = [FakeLVInfo('test1', 'raid1')]
+
+    volume._detach_cache()
+
+    assert b.resets == 1
+    assert b.added == []
+    assert b.destroyed == ['resolved foo-cache']
+
+
+class FakeLUKSFormat(object):
+    type = 'luks'
+
+    def __init__(self, map_name, configured=True, fail=False):
+        self.map_name = map_name
+        self.device = '/dev/' + map_name[len('luks-'):]
+        self.key_file = None
+        self.configured = configured
+        self.status = False
+        self.fail = fail
+        self.passphrase = None
+        self._key_file = None
+
+    def setup(self):
+        if self.fail:
+            raise RuntimeError('wrong passphrase')
+        self.status = True
+
+
+class FakeLUKSDevice(FakeTreeDevice):
+    def __init__(self, name, **kwargs):
+        super(FakeLUKSDevice, self).__init__(name)
+        self.format = FakeLUKSFormat('luks-' + name, **kwargs)
+        self.original_format = FakeLUKSFormat('luks-' + name)
+        self.children = list()
+
+    @property
+    def isleaf(self):
+        return not self.children
+
+
+class FakeLUKSTree(object):
+    def __init__(self, luks_devices, hidden=()):
+        self.by_map_name = dict((d.format.map_name, d) for d in luks_devices)
+        self.hidden = hidden
+        self.handled = list()
+        self.populates = 0
+
+    def handle_device(self, info):
+        self.handled.append(info)
+        if info not in self.hidden:
+            self.by_map_name[info].children.append(FakeTreeDevice(info))
+
+    def populate(self):
+        self.populates += 1
+        for device in self.by_map_name.values():
+            if device.format.status and not device.children:
+                device.children.append(FakeTreeDevice(device.format.map_name))
+
+
+@pytest.fixture
+def luks_env(monkeypatch):
+    fake_udev = type('FakeUdev', (object,), {})()
+    fake_udev.settles = list()
+    fake_udev.settle = lambda: fake_udev.settles.append(True)
+    fake_udev.get_device = lambda device_node: device_node[len('/dev/mapper/'):]
+    monkeypatch.setattr(blivet, 'udev', fake_udev, raising=False)
+    return fake_udev
+
+
+def test_unlock_luks_devices(luks_env):
+    devices = [FakeLUKSDevice('sdb'), FakeLUKSDevice('sdc', fail=True), FakeLUKSDevice('sdd', configured=False),
+               FakeLUKSDevice('sde')]
+    tree = FakeLUKSTree(devices)
+    b = type('FakeB', (object,), dict(devicetree=tree))()
+
+    blivet.unlock_luks_devices(b, devices)
+
+    assert luks_env.settles == [True]
+    assert tree.handled == ['luks-sdb', 'luks-sde']
+    assert tree.populates == 0
+    assert [d.isleaf for d in devices] == [False, True, True, False]
+    assert devices[0].children[0].name == 'luks-sdb'
+
+
+def test_unlock_luks_devices_populate_fallback(luks_env):
+    devices = [FakeLUKSDevice('sdb'), FakeLUKSDevice('sdc')]
+    tree = FakeLUKSTree(devices, hidden=['luks-sdc'])
+    b = type('FakeB', (object,), dict(devicetree=tree))()
+
+    blivet.unlock_luks_devices(b, devices)
+
+    assert tree.populates == 1
+    assert not any(d.isleaf for d in devices)
+
+
+def test_unlock_volumes(luks_env, monkeypatch):
+    devices = dict((name, FakeLUKSDevice(name)) for name in ('sdb', 'sdc'))
+    devices['sdd'] = FakeTreeDevice('sdd')
+    devices['sdd'].format = FakeLUKSFormat('unused')
+    devices['sdd'].format.type = 'xfs'
+    tree = FakeLUKSTree([devices['sdb'], devices['sdc']])
+    b = type('FakeB', (object,), dict(devicetree=tree))()
+    monkeypatch.setattr(blivet, 'resolve_device', lambda b, spec: devices.get(spec))
+
+    bvolumes = [blivet.BlivetDiskVolume(b, _volume(name=name, disks=[name], encryption_password='secret'))
+                for name in ('sdb', 'sdc', 'sdd', 'sdx')]
+    blivet.unlock_volumes(b, bvolumes)
+
+    # all LUKS devices are opened in a single pass
+    assert luks_env.settles == [True]
+    assert tree.handled == ['luks-sdb', 'luks-sdc']
+    assert devices['sdb'].format.passphrase == devices['sdb'].original_format.passphrase == 'secret'
+
+    bvolumes[0]._type_check = lambda: True
+    bvolumes[0]._look_up_device()
+    assert bvolumes[0]._device is devices['sdb'].children[0]
+    assert luks_env.settles == [True]
+
+
+def test_luks_unlock_workers(monkeypatch):
+    monkeypatch.setattr(blivet, '_mem_available', lambda: 3 * blivet.LUKS_UNLOCK_MEMORY + 1)
+    assert blivet.luks_unlock_workers(8, 24) == 3
+    assert blivet.luks_unlock_workers(2, 24) == 2
+    assert blivet.luks_unlock_workers(8, 2) == 2
+    assert blivet.luks_unlock_workers(8, 0) == 1
+
+    monkeypatch.setattr(blivet, '_mem_available', lambda: blivet.LUKS_UNLOCK_MEMORY // 2)
+    assert blivet.luks_unlock_workers(8, 24) == 1
+
+    monkeypatch.setattr(blivet, '_mem_available', lambda: None)
+    assert blivet.luks_unlock_workers(8, 24) == 8
+
+
+def test_unlock_luks_devices_parallel(luks_env, monkeypatch):
+    devices = [FakeLUKSDevice('sd%s' % letter) for letter in 'bcdefg']
+    tree = FakeLUKSTree(devices)
+    b = type('FakeB', (object,), dict(devicetree=tree))()
+    monkeypatch.setattr(blivet, '_mem_available', lambda: 3 * blivet.LUKS_UNLOCK_MEMORY)
+
+    lock = threading.Lock()
+    barrier = threading.Event()
+    running = [0, 0]  # current, maximum
+    opens = list()
+
+    def luks_open(path, map_name, passphrase=None, key_file=None):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+            opens.append((path, map_name, passphrase, key_file))
+            if running[0] == 3:
+                barrier.set()
+        barrier.wait(5)
+        with lock:
+            running[0] -= 1
+        if path == '/dev/sdd':
+            raise blivet.BlivetAnsibleError('wrong passphrase')
+
+    monkeypatch.setattr(blivet, '_luks_open', luks_open)
+
+    blivet.unlock_luks_devices(b, devices, workers=8, passphrase='secret')
+
+    # limited by the memory for three unlocks
+    assert running[1] == 3
+    assert sorted(opens) == [('/dev/sd%s' % letter, 'luks-sd%s' % letter, 'secret', None) for letter in 'bcdefg']
+    # the devices are not set up through blivet, they are discovered in the original order
+    assert not any(d.format.status for d in devices)
+    assert tree.handled == ['luks-sd%s' % letter for letter in 'bcefg']
+    assert tree.populates == 0
+
+
+def test_pool_unlock_members(luks_env, monkeypatch):
+    sdb = FakeLUKSDevice('sdb')
+    sdc = FakeTreeDevice('sdc')
+    sdc.format = FakeLUKSFormat('unused')
+    sdc.format.type = 'disklabel'
+    sdc.children = [FakeLUKSDevice('sdc1')]
+    tree = FakeLUKSTree([sdb, sdc.children[0]])
+    b = type('FakeB', (object,), dict(devicetree=tree))()
+    vg = FakeTreeDevice('foo')
+    vg.type = 'lvmvg'
+    vg.children = list()
+    vg.parents = list()
+    specs = dict(sdb=sdb, sdc=sdc)
+    monkeypatch.setattr(blivet, 'resolve_device',
+                        lambda b, spec: vg if spec == 'foo' and tree.handled else specs.get(spec))
+    monkeypatch.setattr(blivet, 'unlock_workers', 4)
+    unlocks = list()
+    real_unlock = blivet.unlock_luks_devices
+
+    def unlock_luks_devices(b, devices, **kwargs):
+        unlocks.append((devices, kwargs))
+        real_unlock(b, devices)
+
+    monkeypatch.setattr(blivet, 'unlock_luks_devices', unlock_luks_devices)
+
+    bpool = blivet.BlivetLVMPool(b, _pool(disks=['sdb', 'sdc'], encryption_password='secret', encryption_key=None))
+    bpool._look_up_device()
+
+    assert bpool._device is vg
+    assert unlocks == [([sdb, sdc.children[0]], dict(workers=4, passphrase='secret', key_file=None))]
+    assert luks_env.settles == [True]
+    assert tree.handled == ['luks-sdb', 'luks-sdc1']
+    assert sdb.format.passphrase == sdb.original_format.passphrase == 'secret'
+
+    # nothing is unlocked without a passphrase or key file
+    unlocks[:] = []
+    tree.handled = list()
+    bpool = blivet.BlivetLVMPool(b, _pool(disks=['sdb'], encryption_password=None, encryption_key=None))
+    bpool._look_up_device()
+    assert bpool._device is None
+    assert unlocks == []
+
+
+def test_get_scan_filter():
+    report = blivet.get_device_report(FakeModule())
+
+    # the VG spanning sdb also needs sdc
+    assert blivet.get_scan_filter(report, [_pool(disks=['sdb'])], []) == (['sdb', 'sdc'], ['sda', 'sda1', 'sdd'])
+    # existing pool looked up by name
+    assert blivet.get_scan_filter(report, [_pool(disks=[])], []) == (['sdb', 'sdc'], ['sda', 'sda1', 'sdd'])
+    assert blivet.get_scan_filter(report, [], [_volume(name='data', disks=['/dev/sdd'])]) == \
+        (['sdd'], ['dm-0', 'dm-1', 'sda', 'sda1', 'sdb', 'sdc'])
+    # a partition pulls in its whole disk
+    pool = _pool(name='bar', disks=['sdd'], volumes=[_volume(name='lv', cache_devices=['sda1'])])
+    assert blivet.get_scan_filter(report, [pool], []) == (['sda', 'sdd'], ['dm-0', 'dm-1', 'sdb', 'sdc'])
+
+    # everything has to be scanned if a device is unknown or not given
+    assert blivet.get_scan_filter(report, [_pool(name='bar', disks=['sdx'])], []) is None
+    assert blivet.get_scan_filter(report, [_pool(name='bar', disks=[])], []) is None
+    assert blivet.get_scan_filter(report, [], [_volume(name='data')]) is None
+
+
+def test_set_up_exclusive_scan(monkeypatch):
+    fake_udev = type('FakeUdev', (object,), dict(ignored_device_names=list()))()
+    monkeypatch.setattr(blivet, 'udev', fake_udev, raising=False)
+    report = blivet.get_device_report(FakeModule())
+    b = type('FakeB', (object,), dict(exclusive_disks=list()))()
+
+    blivet.set_up_exclusive_scan(b, report, [_pool(disks=['sdb'])], [])
+
+    assert b.exclusive_disks == ['sdb', 'sdc']
+    assert len(fake_udev.ignored_device_names) == 1
+    ignored = re.compile(fake_udev.ignored_device_names[0])
+    names = ('sda', 'sda1', 'sda11', 'sdb', 'sdd', 'dm-0', 'dm-2')
+    assert [name for name in names if ignored.search(name)] == ['sda', 'sda1', 'sdd']
+
+    fake_udev.ignored_device_names = list()
+    b.exclusive_disks = list()
+    blivet.set_up_exclusive_scan(b, None, [_pool(disks=['sdb'])], [])
+    blivet.set_up_exclusive_scan(b, report, [_pool(disks=['sdx'])], [])
+    assert b.exclusive_disks == []
+    assert fake_udev.ignored_device_names == []
+
+
+@pytest.mark.parametrize('spec,may_be_device', [
+    ('UUID=root-uuid', True),
+    ('LABEL=a:b', True),
+    ('PARTLABEL=data:1', True),
+    ('PARTUUID="x:y"', True),
+    ('/dev/md/host:name', True),
+    ('/dev/sda1', True),
+    ('tmpfs', True),
+    ('server:/export', False),
+    ('[fe80::1]:/export', False),
+    ('//server/share', False),
+    ('/srv/data', False),
+])
+def test_fstab_may_be_device(spec, may_be_device):
+    assert blivet.FSTab._may_be_device(spec) is may_be_device
@@ -0,0 +1,52 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+import pytest
+
+import blockdev_info
+
+
+@pytest.fixture
+def dev_tree(tmp_path, monkeypatch):
+    """Create md and stratis symlinks pointing to fake kernel device nodes."""
+    dev = tmp_path / 'dev'
+    dev.mkdir()
+    for node in ('md127', 'md126', 'dm-3', 'dm-4'):
+        (dev / node).write_text(u'')
+
+    os.makedirs(str(dev / 'md'))
+    os.symlink('../md127', str(dev / 'md' / 'data'))
+    os.symlink('../md126', str(dev / 'md' / 'logs'))
+    os.makedirs(str(dev / 'stratis' / 'pool1'))
+    os.symlink('../../dm-3', str(dev / 'stratis' / 'pool1' / 'fs1'))
+    os.symlink('../../dm-4', str(dev / 'stratis' / 'pool1' / 'fs2'))
+
+    monkeypatch.setattr(blockdev_info, 'DEV_MD_DIR', str(dev / 'md'))
+    monkeypatch.setattr(blockdev_info, 'DEV_STRATIS_DIR', str(dev / 'stratis'))
+    monkeypatch.setattr(blockdev_info, '_path_indexes', dict())
+    return str(dev)
+
+
+def test_fixup_paths(dev_tree, monkeypatch):
+    assert blockdev_info._fixup_md_path(dev_tree + '/md127') == dev_tree + '/md/data'
+    assert blockdev_info._fixup_md_path(dev_tree + '/md126') == dev_tree + '/md/logs'
+    assert blockdev_info._fixup_md_path(dev_tree + '/md125') == dev_tree + '/md125'
+    assert blockdev_info._fixup_stratis_path(dev_tree + '/dm-4') == dev_tree + '/stratis/pool1/fs2'
+
+    # the directories are only read once
+    def listdir(path):
+        raise AssertionError('%s listed again' % path)
+    monkeypatch.setattr(os, 'listdir', listdir)
+    assert blockdev_info._fixup_md_path(dev_tree + '/md127') == dev_tree + '/md/data'
+    assert blockdev_info._fixup_stratis_path(dev_tree + '/dm-3') == dev_tree + '/stratis/pool1/fs1'
+
+
+def test_fixup_paths_no_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(blockdev_info, 'DEV_MD_DIR', str(tmp_path / 'md'))
+    monkeypatch.setattr(blockdev_info, 'DEV_STRATIS_DIR', str(tmp_path / 'stratis'))
+    monkeypatch.setattr(blockdev_info, '_path_indexes', dict())
+    assert blockdev_info._fixup_md_path('/dev/md127') == '/dev/md127'
+    assert blockdev_info._fixup_stratis_path('/dev/mapper/stratis-1-x') == '/dev/mapper/stratis-1-x'
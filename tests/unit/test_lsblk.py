@@ -0,0 +1,80 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from storage_lsr import lsblk
+from storage_lsr.lsblk import get_devices, parse_json, parse_pairs
+
+
+PAIRS_OUTPUT = """NAME="/dev/sda" TYPE="disk" SIZE="10737418240" FSTYPE="" LABEL="" LOG_SEC="512" RO="0"
+NAME="/dev/sda1" TYPE="part" SIZE="10736369664" FSTYPE="xfs" LABEL="my\\x20data\\x22" LOG_SEC="512" RO="0"
+NAME="/dev/sr0" TYPE="rom" SIZE="1073741312" FSTYPE="iso9660" LABEL="caf\\xc3\\xa9" LOG_SEC="2048" RO="1"
+"""
+
+JSON_OUTPUT = json.dumps({"blockdevices": [
+    {"name": "/dev/sda", "type": "disk", "size": 10737418240, "fstype": None, "label": None,
+     "log-sec": 512, "ro": False},
+    {"name": "/dev/sda1", "type": "part", "size": 10736369664, "fstype": "xfs", "label": "my data\"",
+     "log-sec": 512, "ro": False},
+    {"name": "/dev/sr0", "type": "rom", "size": 1073741312, "fstype": "iso9660", "label": u"café",
+     "log-sec": 2048, "ro": True}]})
+
+EXPECTED = [dict(name="/dev/sda", type="disk", size="10737418240", fstype="", label="", ro="0"),
+            dict(name="/dev/sda1", type="part", size="10736369664", fstype="xfs", label="my data\"", ro="0"),
+            dict(name="/dev/sr0", type="rom", size="1073741312", fstype="iso9660", label=u"café", ro="1")]
+EXPECTED[0]["log-sec"] = EXPECTED[1]["log-sec"] = "512"
+EXPECTED[2]["log-sec"] = "2048"
+
+
+@pytest.fixture(autouse=True)
+def lsblk_cache():
+    lsblk._lsblk_cache.clear()
+
+
+def test_parse_pairs():
+    assert parse_pairs(PAIRS_OUTPUT) == EXPECTED
+    assert parse_pairs("\n") == []
+
+
+def test_parse_pairs_irregular():
+    # lines with different columns are parsed one at a time
+    irregular = 'NAME="/dev/sda" TYPE="disk"\n\nNAME="/dev/sd\\x20b"\n'
+    assert parse_pairs(irregular) == [dict(name="/dev/sda", type="disk"), dict(name="/dev/sd b")]
+    assert parse_pairs('NAME="/dev/sda"\nNAME="/dev/sdb"\n') == [dict(name="/dev/sda"), dict(name="/dev/sdb")]
+
+
+def test_parse_json():
+    assert parse_json(JSON_OUTPUT) == EXPECTED
+
+
+@pytest.mark.parametrize('json_result', [(0, JSON_OUTPUT, ''),
+                                         (1, '', 'lsblk: unrecognized option'),
+                                         (0, 'garbage', '')])
+def test_get_devices(json_result):
+    commands = list()
+
+    def run_command(args):
+        commands.append(args)
+        return json_result if '--json' in args else (0, PAIRS_OUTPUT, '')
+
+    assert get_devices(run_command, ['NAME', 'TYPE'], ['-p']) == EXPECTED
+    assert commands[0] == ['lsblk', '-o', 'NAME,TYPE', '-p', '--json', '--list']
+    if json_result[1] != JSON_OUTPUT:
+        assert commands[1] == ['lsblk', '-o', 'NAME,TYPE', '-p', '--pairs']
+
+
+def test_get_devices_without_json():
+    commands = list()
+
+    def run_command(args):
+        commands.append(args)
+        return (1, '', 'lsblk: unrecognized option') if '--json' in args else (0, PAIRS_OUTPUT, '')
+
+    assert get_devices(run_command, ['NAME', 'TYPE'], ['-p']) == EXPECTED
+    assert get_devices(run_command, ['NAME', 'TYPE'], ['-p']) == EXPECTED
+    # lsblk is asked for --json only once
+    assert [args[-1] for args in commands] == ['--list', '--pairs', '--pairs']
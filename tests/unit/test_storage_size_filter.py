@@ -0,0 +1,50 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import sys
+
+import pytest
+
+try:
+    from importlib import reload as imp_reload
+except ImportError:
+    from imp import reload as imp_reload  # pylint: disable=deprecated-module
+
+from ansible.errors import AnsibleFilterError
+
+import bsize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'filter_plugins'))
+import storage_size  # noqa: E402 pylint: disable=wrong-import-position
+
+
+@pytest.mark.parametrize('value', ['10 GiB', '1GB', '5g', '1.5 TiB', '10737418240', 10737418240, '999.9 MB'])
+def test_filters_match_bsize(value):
+    expected = bsize.convert_size(str(value))
+    filters = storage_size.FilterModule().filters()
+    assert filters['size_bytes'](value) == expected['bytes']
+    assert filters['size_lvm'](value) == expected['lvm']
+    assert filters['size_parted'](value) == expected['parted']
+    assert filters['size_human'](value) == expected['size']
+
+
+def test_filters_invalid():
+    with pytest.raises(AnsibleFilterError, match="Unable to identify unit"):
+        storage_size.size_bytes('1 GidB')
+
+
+def test_filters_role_fallback(monkeypatch):
+    # outside of a collection the role's module_utils are not importable on the controller
+    monkeypatch.setitem(sys.modules, 'ansible.module_utils.storage_lsr', None)
+    monkeypatch.setitem(sys.modules, 'ansible.module_utils.storage_lsr.size', None)
+    path = list(sys.path)
+    plugin = imp_reload(storage_size)
+    try:
+        assert sys.path == path
+        assert plugin.Size.__module__ == '_storage_lsr_size'
+        assert plugin.size_lvm('10 GiB') == '10g'
+    finally:
+        monkeypatch.undo()
+        imp_reload(storage_size)
@@ -7,13 +7,6 @@ import find_unused_disk
 import os
 
 
-blkid_data_pttype = [('/dev/sdx', '/dev/sdx: PTTYPE=\"dos\"'),
-                     ('/dev/sdy', '/dev/sdy: PTTYPE=\"test\"')]
-
-blkid_data = [('/dev/sdx', 'UUID=\"hello-1234-56789\" TYPE=\"crypto_LUKS\" LOG-SEC=\"512\"'),
-              ('/dev/sdy', 'UUID=\"this-1s-a-t3st-f0r-ansible\" VERSION=\"LVM2 001\" TYPE=\"LVM2_member\" USAGE=\"raid\" LOG-SEC=\"512\"'),
-              ('/dev/sdz', 'LABEL=\"/data\" UUID=\"a12bcdef-345g-67h8-90i1-234j56789k10\" VERSION=\"1.0\" TYPE=\"ext4\" USAGE=\"filesystem\" LOG-SEC=\"512\"')]
-
 holders_data_none = [('/dev/sdx', ''),
                      ('/dev/dm-99', '')]
 
@@ -21,20 +14,6 @@ holders_data = [('/dev/sdx', 'dm-0'),
                 ('/dev/dm-99', 'dm-2 dm-3 dm-4')]
 
 
-@pytest.mark.parametrize('disk, blkid', blkid_data_pttype)
-def test_no_signature_true(disk, blkid):
-    def run_command(args):
-        return [0, blkid, '']
-    assert find_unused_disk.no_signature(run_command, disk) is True
-
-
-@pytest.mark.parametrize('disk, blkid', blkid_data)
-def test_no_signature_false(disk, blkid):
-    def run_command(args):
-        return [0, blkid, '']
-    assert find_unused_disk.no_signature(run_command, disk) is False
-
-
 @pytest.mark.parametrize('disk, holders', holders_data_none)
 def test_no_holders_true(disk, holders, monkeypatch):
     def mock_return(args):
@@ -74,3 +53,160 @@ def test_is_ignored(monkeypatch):
     assert find_unused_disk.is_ignored('/dev/mapper/mpatha') is False
     assert find_unused_disk.is_ignored('/dev/md/Volume0') is False
     assert find_unused_disk.is_ignored('/dev/nullb0') is True
+
+
+DRIVERS = {'scsi': ('device/driver', '../../../../bus/scsi/drivers/sd'),
+           'virtio': ('device/device/driver', '../../../bus/virtio/drivers/virtio_blk'),
+           'nvme': ('device/device/driver', '../../../../bus/pci/drivers/nvme')}
+
+
+def make_sysfs(root, disks):
+    """Create a fake /sys/class/block tree for the given disks.
+
+    disks maps a disk name to a dict with the 'interface', 'partitions' and
+    'holders' of the disk.
+    """
+    for name, attrs in disks.items():
+        disk_dir = os.path.join(str(root), name)
+        os.makedirs(os.path.join(disk_dir, 'holders'))
+        os.makedirs(os.path.join(disk_dir, 'queue'))
+        for partition in attrs.get('partitions', []):
+            os.makedirs(os.path.join(disk_dir, partition))
+        for holder in attrs.get('holders', []):
+            os.symlink('../../' + holder, os.path.join(disk_dir, 'holders', holder))
+        link, target = DRIVERS[attrs.get('interface', 'scsi')]
+        os.makedirs(os.path.dirname(os.path.join(disk_dir, link)))
+        os.symlink(target, os.path.join(disk_dir, link))
+
+    return str(root) + '/'
+
+
+SYSFS_DISKS = {'sda': dict(partitions=['sda1', 'sda2']),
+               'sdb': dict(),
+               'sdc': dict(holders=['dm-0']),
+               'vda': dict(interface='virtio'),
+               'nvme0n1': dict(interface='nvme', partitions=['nvme0n1p1']),
+               'nvme1n1': dict(interface='nvme')}
+
+
+def test_read_sysfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(find_unused_disk, 'SYS_CLASS_BLOCK', make_sysfs(tmp_path, SYSFS_DISKS))
+    sysfs = dict(('/dev/' + name, find_unused_disk.read_sysfs('/dev/' + name)) for name in SYSFS_DISKS)
+
+    assert sorted(sysfs['/dev/sda']['partitions']) == ['sda1', 'sda2']
+    assert sysfs['/dev/nvme0n1']['partitions'] == ['nvme0n1p1']
+    assert sysfs['/dev/sdb']['partitions'] == []
+    assert sysfs['/dev/sdb']['no_holders'] is True
+    assert sysfs['/dev/sdc']['no_holders'] is False
+    assert find_unused_disk.is_device_interface(sysfs['/dev/sdb']['drivers'], 'scsi')
+    assert find_unused_disk.is_device_interface(sysfs['/dev/vda']['drivers'], 'virtio')
+    assert find_unused_disk.is_device_interface(sysfs['/dev/nvme1n1']['drivers'], 'nvme')
+    assert not find_unused_disk.is_device_interface(sysfs['/dev/vda']['drivers'], 'nvme')
+
+
+class FakeModule(object):
+    def __init__(self, lsblk, blkid='', **params):
+        self.lsblk = lsblk
+        self.blkid = blkid
+        self.commands = list()
+        self.params = dict(max_return=10, min_size='0', max_size='0', with_interface=None, match_sector_size=False)
+        self.params.update(params)
+
+    def run_command(self, args):
+        self.commands.append(args)
+        if args[0] == 'blkid':
+            return 0, self.blkid, ''
+        return 0, self.lsblk, ''
+
+    def log(self, msg):
+        pass
+
+
+def lsblk_output(names, size=10737418240, ssize=512):
+    return ''.join('NAME="/dev/%s" TYPE="disk" SIZE="%d" FSTYPE="" LOG-SEC="%d"\n' % (name, size, ssize)
+                   for name in names)
+
+
+@pytest.mark.parametrize('interface, expected', [(None, ['/dev/sdb', '/dev/vda']),
+                                                 ('nvme', ['/dev/nvme1n1']),
+                                                 ('virtio', ['/dev/vda'])])
+def test_filter_disks(tmp_path, monkeypatch, interface, expected):
+    monkeypatch.setattr(find_unused_disk, 'SYS_CLASS_BLOCK', make_sysfs(tmp_path, SYSFS_DISKS))
+    monkeypatch.setattr(find_unused_disk, 'can_open', lambda path: True)
+    module = FakeModule(lsblk_output(SYSFS_DISKS), with_interface=interface)
+
+    disks, info = find_unused_disk.filter_disks(module)
+
+    assert sorted(disks) == expected
+    if interface is None:
+        assert 'filename [sda1] is a partition' in info
+        assert any(line.startswith('Disk [/dev/sdc]') and line.endswith('has holders') for line in info)
+
+
+def test_get_signatures():
+    blkid = ('/dev/sdb: PTUUID="0b6c2a2e" PTTYPE="dos"\n'
+             '/dev/sdc: UUID="this-1s-a-t3st" VERSION="LVM2 001" TYPE="LVM2_member" USAGE="raid"\n')
+    commands = list()
+
+    def run_command(args):
+        commands.append(args)
+        return 0, blkid, ''
+
+    signatures = find_unused_disk.get_signatures(run_command, ['/dev/sda', '/dev/sdb', '/dev/sdc'])
+
+    assert commands == [['blkid', '-p', '/dev/sda', '/dev/sdb', '/dev/sdc']]
+    assert not find_unused_disk.has_signature(signatures['/dev/sda'])
+    assert not find_unused_disk.has_signature(signatures['/dev/sdb'])
+    assert find_unused_disk.has_signature(signatures['/dev/sdc'])
+    assert find_unused_disk.get_signatures(run_command, []) == {}
+    assert len(commands) == 1
+
+
+def test_filter_disks_signatures(tmp_path, monkeypatch):
+    disks = dict(('sd%s' % letter, dict()) for letter in 'abcd')
+    monkeypatch.setattr(find_unused_disk, 'SYS_CLASS_BLOCK', make_sysfs(tmp_path, disks))
+    monkeypatch.setattr(find_unused_disk, 'can_open', lambda path: True)
+    module = FakeModule(lsblk_output(disks), blkid='/dev/sdb: PTUUID="0b6c2a2e" PTTYPE="gpt"\n'
+                                                   '/dev/sdc: UUID="a12b" TYPE="xfs"\n')
+
+    found, info = find_unused_disk.filter_disks(module)
+
+    assert sorted(found) == ['/dev/sda', '/dev/sdb', '/dev/sdd']
+    assert len([args for args in module.commands if args[0] == 'blkid']) == 1
+    assert any(line.startswith('Disk [/dev/sdc]') and 'has signature' in line for line in info)
+
+
+def test_filter_disks_limit(tmp_path, monkeypatch):
+    disks = dict(('sd%s' % letter, dict()) for letter in 'fedcba')
+    opened = list()
+    monkeypatch.setattr(find_unused_disk, 'SYS_CLASS_BLOCK', make_sysfs(tmp_path, disks))
+    monkeypatch.setattr(find_unused_disk, 'can_open', lambda path: opened.append(path) or path != '/dev/sdb')
+    module = FakeModule(lsblk_output(disks), blkid='/dev/sda: UUID="a12b" TYPE="xfs"\n')
+
+    found, info = find_unused_disk.filter_disks(module, limit=2)
+
+    assert sorted(found) == ['/dev/sdc', '/dev/sdd']
+    assert opened == ['/dev/sdb', '/dev/sdc', '/dev/sdd']
+    assert [args[2:] for args in module.commands if args[0] == 'blkid'] == [['/dev/sda', '/dev/sdb'],
+                                                                            ['/dev/sdc', '/dev/sdd']]
+
+
+def test_filter_disks_by_sector_size(tmp_path, monkeypatch):
+    names = ['sda', 'sdb', 'sdc', 'sdd', 'sde', 'sdf']
+    monkeypatch.setattr(find_unused_disk, 'SYS_CLASS_BLOCK',
+                        make_sysfs(tmp_path, dict((name, dict()) for name in names)))
+    monkeypatch.setattr(find_unused_disk, 'can_open', lambda path: path != '/dev/sda')
+    # 4096: sda, sdc, sde (sda can not be opened); 512: sdb, sdd, sdf (sdf is smaller than min_size)
+    lsblk = ''.join('NAME="/dev/%s" TYPE="disk" SIZE="%d" FSTYPE="" LOG-SEC="%d"\n'
+                    % (name, 1024 if name == 'sdf' else 10737418240, 4096 if idx % 2 == 0 else 512)
+                    for idx, name in enumerate(names))
+
+    found, info = find_unused_disk.filter_disks_by_sector_size(FakeModule(lsblk, min_size='1 MiB'))
+    # a tie, the group with the qualified disk listed first by lsblk wins
+    assert sorted(found) == ['/dev/sdb', '/dev/sdd']
+
+    found, info = find_unused_disk.filter_disks_by_sector_size(FakeModule(lsblk))
+    assert sorted(found) == ['/dev/sdb', '/dev/sdd', '/dev/sdf']
+
+    found, info = find_unused_disk.filter_disks_by_sector_size(FakeModule(lsblk, min_size='100 GiB'))
+    assert found == {}